@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""Benchmark exam creation end-to-end against the offline fake question provider
+
+Drives POST /api/exams/create and polls /api/exams/generation-status through the
+real app (in-process, no network) and reports latency percentiles and throughput.
+Needs the MongoDB configured by MONGO_URL; results go to a throwaway database.
+
+    python benchmark_generation.py --exams 20 --concurrency 5 --questions 30 --latency 1.5
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+import uuid
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--exams", type=int, default=10, help="exams to create")
+    parser.add_argument("--concurrency", type=int, default=3, help="exams created at the same time")
+    parser.add_argument("--questions", type=int, default=30, help="questions per exam")
+    parser.add_argument("--exam-type", default="NEET")
+    parser.add_argument("--difficulty", default="Medium")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--latency", type=float, default=2.0, help="median provider latency in seconds")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="log-normal spread of provider latency")
+    parser.add_argument("--truncation-rate", type=float, default=0.0)
+    parser.add_argument("--malformed-rate", type=float, default=0.0)
+    parser.add_argument("--quota-error-rate", type=float, default=0.0)
+    parser.add_argument("--rejection-rate", type=float, default=0.0)
+    parser.add_argument("--use-bank", action="store_true", help="keep the question bank enabled")
+    parser.add_argument("--use-cache", action="store_true", help="allow generation cache hits")
+    parser.add_argument("--timeout", type=float, default=600.0, help="seconds to wait for each exam")
+    return parser.parse_args()
+
+
+def configure_environment(args):
+    # Must happen before server is imported: it reads configuration at import time
+    os.environ["QUESTION_PROVIDER"] = "fake"
+    os.environ["FAKE_PROVIDER_SEED"] = str(args.seed)
+    os.environ["FAKE_PROVIDER_LATENCY_MEDIAN"] = str(args.latency)
+    os.environ["FAKE_PROVIDER_LATENCY_SIGMA"] = str(args.latency_sigma)
+    os.environ["FAKE_PROVIDER_TRUNCATION_RATE"] = str(args.truncation_rate)
+    os.environ["FAKE_PROVIDER_MALFORMED_RATE"] = str(args.malformed_rate)
+    os.environ["FAKE_PROVIDER_QUOTA_ERROR_RATE"] = str(args.quota_error_rate)
+    os.environ["FAKE_PROVIDER_REJECTION_RATE"] = str(args.rejection_rate)
+    os.environ["QUESTION_BANK_ENABLED"] = "true" if args.use_bank else "false"
+    os.environ["DB_NAME"] = f"exam_portal_benchmark_{uuid.uuid4().hex[:8]}"
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+async def create_one(http, headers, exam_config, timeout):
+    started = time.perf_counter()
+    response = await http.post("/api/exams/create", json=exam_config, headers=headers)
+    response.raise_for_status()
+    exam_id = response.json()["exam_id"]
+
+    first_question_at = None
+    deadline = started + timeout
+    while time.perf_counter() < deadline:
+        status = (await http.get(f"/api/exams/generation-status/{exam_id}", headers=headers)).json()
+        if first_question_at is None and status["generated_questions"] > 0:
+            first_question_at = time.perf_counter()
+        if status["status"] in ("completed", "failed"):
+            finished = time.perf_counter()
+            return {
+                "status": status["status"],
+                "latency": finished - started,
+                "first_question": (first_question_at or finished) - started,
+                "questions": status["generated_questions"]
+            }
+        await asyncio.sleep(0.1)
+    return {"status": "timeout", "latency": timeout, "first_question": timeout, "questions": 0}
+
+
+async def run(args):
+    import httpx
+    import server
+
+    for handler in server.app.router.on_startup:
+        await handler()
+
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as http:
+        registration = await http.post("/api/auth/register", json={
+            "email": f"bench-{uuid.uuid4().hex[:8]}@example.com",
+            "full_name": "Benchmark User",
+            "password": "benchmark-password"
+        })
+        registration.raise_for_status()
+        headers = {"Authorization": f"Bearer {registration.json()['token']}"}
+
+        subjects = list(server.SUBJECT_DISTRIBUTION.get(args.exam_type, {"Physics": 1, "Chemistry": 1}))
+        exam_config = {
+            "exam_type": args.exam_type,
+            "subjects": subjects,
+            "question_count": args.questions,
+            "duration": 60,
+            "difficulty": args.difficulty,
+            "generation_cache": "use" if args.use_cache else "bypass"
+        }
+
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def bounded():
+            async with semaphore:
+                return await create_one(http, headers, exam_config, args.timeout)
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*(bounded() for _ in range(args.exams)))
+        elapsed = time.perf_counter() - started
+
+    for handler in server.app.router.on_shutdown:
+        await handler()
+    return results, elapsed
+
+
+async def drop_database():
+    import server
+    client = server.AsyncIOMotorClient(server.mongo_url)
+    await client.drop_database(os.environ["DB_NAME"])
+    client.close()
+
+
+def report(args, results, elapsed):
+    completed = [result for result in results if result["status"] == "completed"]
+    latencies = [result["latency"] for result in completed]
+    print(f"Exams: {len(results)} ({len(completed)} completed, {len(results) - len(completed)} failed/timed out)")
+    print(f"Questions per exam: {args.questions}, concurrency: {args.concurrency}, provider median latency: {args.latency}s")
+    if latencies:
+        print(f"Latency p50: {percentile(latencies, 50):.2f}s  p95: {percentile(latencies, 95):.2f}s  "
+              f"p99: {percentile(latencies, 99):.2f}s  mean: {statistics.mean(latencies):.2f}s")
+        first = [result["first_question"] for result in completed]
+        print(f"Time to first question p50: {percentile(first, 50):.2f}s  p95: {percentile(first, 95):.2f}s")
+    questions = sum(result["questions"] for result in results)
+    print(f"Throughput: {len(completed) / elapsed:.3f} exams/s, {questions / elapsed:.1f} questions/s over {elapsed:.1f}s")
+
+
+def main():
+    args = parse_args()
+    configure_environment(args)
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    try:
+        results, elapsed = asyncio.run(run(args))
+    finally:
+        asyncio.run(drop_database())
+    report(args, results, elapsed)
+
+
+if __name__ == "__main__":
+    main()
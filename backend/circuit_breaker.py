@@ -0,0 +1,138 @@
+import asyncio
+import logging
+import time
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the upstream while the circuit is open"""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"{name} circuit is open; retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class _Guard:
+    def __init__(self, breaker: "CircuitBreaker", probe: bool):
+        self._breaker = breaker
+        self._probe = probe
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._breaker._finish(self._probe, exc)
+        return False
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with half-open probing
+
+    Opens after `failure_threshold` consecutive failures and refuses calls for
+    `reset_timeout` seconds. It then admits one probe: success closes the
+    circuit, failure reopens it with the timeout doubled up to
+    `max_reset_timeout`. Calls arriving while the probe is in flight wait for
+    its outcome rather than failing. Only exceptions matching `is_failure` count;
+    cancellations and other errors leave the state unchanged.
+    """
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float,
+                 max_reset_timeout: Optional[float] = None, is_failure: Optional[Callable[[BaseException], bool]] = None):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.base_reset_timeout = reset_timeout
+        self.max_reset_timeout = max(reset_timeout, max_reset_timeout or reset_timeout)
+        self._is_failure = is_failure or (lambda exc: True)
+        self._state = CLOSED
+        self._failures = 0
+        self._reset_timeout = reset_timeout
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._probe_finished: Optional[asyncio.Event] = None
+        self.times_opened = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self._reset_timeout:
+            self._state = HALF_OPEN
+        return self._state
+
+    @property
+    def retry_after(self) -> float:
+        """Seconds until the next probe is allowed (0 unless open)"""
+        if self.state != OPEN:
+            return 0.0
+        return max(0.0, self._reset_timeout - (time.monotonic() - self._opened_at))
+
+    def is_open(self) -> bool:
+        """Whether calls would currently be refused"""
+        return self.state == OPEN
+
+    async def admit(self) -> _Guard:
+        """Admit one call, raising CircuitOpenError if the circuit refuses it
+
+        Use the result as a context manager around the call so its outcome is recorded.
+        """
+        while True:
+            state = self.state
+            if state == CLOSED:
+                return _Guard(self, probe=False)
+            if state == OPEN:
+                self.rejected += 1
+                raise CircuitOpenError(self.name, self.retry_after)
+            if not self._probe_in_flight:
+                self._probe_in_flight = True
+                self._probe_finished = asyncio.Event()
+                logger.info(f"{self.name} circuit half-open; sending a probe call")
+                return _Guard(self, probe=True)
+            await self._probe_finished.wait()
+
+    def _finish(self, probe: bool, exc: Optional[BaseException]):
+        if probe:
+            self._probe_in_flight = False
+            self._probe_finished.set()
+        if exc is None:
+            self._record_success(probe)
+        elif self._is_failure(exc):
+            self._record_failure(probe)
+
+    def _record_success(self, probe: bool):
+        self._failures = 0
+        if probe or self._state == HALF_OPEN:
+            logger.info(f"{self.name} circuit closed after a successful probe")
+            self._state = CLOSED
+            self._reset_timeout = self.base_reset_timeout
+
+    def _record_failure(self, probe: bool):
+        self._failures += 1
+        if probe:
+            self._reset_timeout = min(self.max_reset_timeout, self._reset_timeout * 2)
+            self._open()
+        elif self._state == CLOSED and self._failures >= self.failure_threshold:
+            self._open()
+
+    def _open(self):
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self.times_opened += 1
+        logger.warning(
+            f"{self.name} circuit opened after {self._failures} consecutive failures; "
+            f"failing fast for {self._reset_timeout:.0f}s"
+        )
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self._failures,
+            "retry_after": round(self.retry_after, 1),
+            "reset_timeout": self._reset_timeout,
+            "times_opened": self.times_opened,
+            "rejected": self.rejected
+        }
@@ -0,0 +1,115 @@
+import asyncio
+import base64
+import json
+import logging
+import re
+import time
+from typing import Dict, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+GOOGLE_OAUTH2_CERTS_URL = "https://www.googleapis.com/oauth2/v1/certs"
+GOOGLE_ISSUERS = ("accounts.google.com", "https://accounts.google.com")
+
+_MAX_AGE_PATTERN = re.compile(r"max-age=(\d+)")
+
+
+class GoogleCertsUnavailable(Exception):
+    """Google's signing certificates could not be fetched and none are cached"""
+
+
+def token_key_id(token: str) -> Optional[str]:
+    """The `kid` from a JWT header, without verifying anything"""
+    try:
+        header = token.split(".", 1)[0]
+        return json.loads(base64.urlsafe_b64decode(header + "=" * (-len(header) % 4))).get("kid")
+    except (ValueError, AttributeError):
+        return None
+
+
+class GoogleCertCache:
+    """Google ID-token signing certificates, fetched asynchronously and cached per Cache-Control
+
+    A background task refreshes them before they expire. A token signed with an
+    unknown key id triggers one early refresh, at most every `min_refresh_interval`
+    seconds, to pick up key rotations.
+    """
+
+    def __init__(self, certs_url: str = GOOGLE_OAUTH2_CERTS_URL, default_max_age: float = 3600,
+                 min_refresh_interval: float = 60, http_timeout: float = 10,
+                 transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.certs_url = certs_url
+        self.default_max_age = default_max_age
+        self.min_refresh_interval = min_refresh_interval
+        self.http_timeout = http_timeout
+        self._transport = transport  # Default network transport unless given (e.g. httpx.MockTransport)
+        self._certs: Dict[str, str] = {}
+        self._expires_at = 0.0
+        self._fetched_at = 0.0
+        self._refresh_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.fetches = 0
+        self.fetch_errors = 0
+
+    async def _fetch(self):
+        async with httpx.AsyncClient(timeout=self.http_timeout, transport=self._transport) as http:
+            response = await http.get(self.certs_url)
+        response.raise_for_status()
+        match = _MAX_AGE_PATTERN.search(response.headers.get("cache-control", ""))
+        max_age = float(match.group(1)) if match else self.default_max_age
+        now = time.monotonic()
+        self._certs = response.json()
+        self._fetched_at = now
+        self._expires_at = now + max_age
+        self.fetches += 1
+        logger.info(f"Fetched {len(self._certs)} Google signing certificates, valid for {max_age:.0f}s")
+
+    async def refresh(self, force: bool = False):
+        """Fetch the certificates if they are stale (or, with `force`, rotated)"""
+        async with self._refresh_lock:
+            now = time.monotonic()
+            if force and now - self._fetched_at < self.min_refresh_interval:
+                return
+            if not force and now < self._expires_at:
+                return
+            try:
+                await self._fetch()
+            except (httpx.HTTPError, ValueError) as e:
+                self.fetch_errors += 1
+                logger.error(f"Failed to fetch Google signing certificates from {self.certs_url}: {str(e)}")
+                if not self._certs:
+                    raise GoogleCertsUnavailable(str(e)) from e
+
+    async def certs_for(self, token: str) -> Dict[str, str]:
+        """Certificates able to verify `token`, refreshing on expiry or an unknown key id"""
+        await self.refresh()
+        key_id = token_key_id(token)
+        if key_id and key_id not in self._certs:
+            await self.refresh(force=True)
+        return self._certs
+
+    async def _refresh_loop(self):
+        while True:
+            # Refresh a little before expiry so requests never wait on the fetch
+            delay = max(self.min_refresh_interval, (self._expires_at - time.monotonic()) * 0.9)
+            await asyncio.sleep(delay)
+            try:
+                await self.refresh(force=True)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Google certificate refresh failed: {str(e)}")
+
+    async def start(self):
+        """Pre-fetch the certificates and keep them fresh in the background"""
+        try:
+            await self.refresh()
+        except GoogleCertsUnavailable:
+            pass  # Retried by the refresh loop and on the first Google sign-in
+        self._task = asyncio.create_task(self._refresh_loop())
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
@@ -0,0 +1,86 @@
+import logging
+from typing import Any, Dict, List, Tuple, Union
+
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+IndexKeys = Union[str, List[Tuple[str, int]]]
+
+
+class IndexSpec:
+    """One index a collection is expected to have"""
+
+    def __init__(self, collection: str, keys: IndexKeys, **options: Any):
+        self.collection = collection
+        self.keys = [(keys, 1)] if isinstance(keys, str) else list(keys)
+        self.options = options
+
+    @property
+    def name(self) -> str:
+        # Same name MongoDB generates by default, so existing indexes are recognised
+        return self.options.get("name") or "_".join(f"{field}_{direction}" for field, direction in self.keys)
+
+    def __repr__(self):
+        return f"{self.collection}.{self.name}"
+
+
+class IndexManager:
+    """Declares the indexes the app's queries rely on and ensures them idempotently
+
+    Creating an existing index is a no-op. A failure on one index (e.g. a
+    unique index over duplicate data) is logged and the rest still get created.
+    """
+
+    def __init__(self, specs: List[IndexSpec]):
+        self.specs = specs
+        self.failed: Dict[str, str] = {}
+
+    def collections(self) -> List[str]:
+        return sorted({spec.collection for spec in self.specs})
+
+    async def ensure(self, db):
+        self.failed = {}
+        for spec in self.specs:
+            try:
+                await db[spec.collection].create_index(spec.keys, name=spec.name, **{k: v for k, v in spec.options.items() if k != "name"})
+            except OperationFailure as e:
+                self.failed[repr(spec)] = str(e)
+                logger.error(f"Could not create index {spec!r}: {str(e)}")
+        logger.info(f"Ensured {len(self.specs) - len(self.failed)} of {len(self.specs)} declared indexes")
+
+    async def report(self, db) -> Dict[str, Dict[str, Any]]:
+        """Per collection: declared indexes that are missing, undeclared ones, and ones never used
+
+        Usage comes from $indexStats and only counts operations since the
+        server last restarted.
+        """
+        report = {}
+        for collection in self.collections():
+            declared = {spec.name for spec in self.specs if spec.collection == collection}
+            existing = set(await db[collection].index_information()) - {"_id_"}
+            usage = {}
+            try:
+                async for stats in db[collection].aggregate([{"$indexStats": {}}]):
+                    usage[stats["name"]] = stats["accesses"]["ops"]
+            except OperationFailure as e:
+                logger.warning(f"$indexStats unavailable for {collection}: {str(e)}")
+            report[collection] = {
+                "missing": sorted(declared - existing),
+                "undeclared": sorted(existing - declared),
+                "unused": sorted(name for name in existing if usage.get(name) == 0),
+                "ops": {name: usage[name] for name in sorted(existing) if name in usage}
+            }
+        return report
+
+    async def log_report(self, db):
+        try:
+            report = await self.report(db)
+        except Exception as e:
+            logger.warning(f"Could not build index report: {str(e)}")
+            return
+        for collection, entry in report.items():
+            if entry["missing"]:
+                logger.warning(f"{collection} is missing indexes {entry['missing']}; matching queries will scan the collection")
+            if entry["undeclared"]:
+                logger.info(f"{collection} has undeclared indexes {entry['undeclared']}")
@@ -0,0 +1,100 @@
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+logger = logging.getLogger(__name__)
+
+
+class LLMExecutorSaturated(Exception):
+    """Raised when the LLM executor queue is full and a call is refused"""
+
+
+class LLMExecutor:
+    """Dedicated, bounded thread pool for blocking LLM client calls
+
+    Keeps slow upstream calls off the event loop's default executor and
+    accounts for calls abandoned after a timeout, which keep their thread
+    until the blocking client returns.
+    """
+
+    def __init__(self, max_workers: int, max_queue: int):
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="llm-call")
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+        self._abandoned = 0
+        self._completed = 0
+        self._timed_out = 0
+        self._cancelled = 0
+        self._rejected = 0
+
+    def _wrap(self, fn: Callable[..., Any], *args, **kwargs) -> Callable[[], Any]:
+        def call():
+            with self._lock:
+                self._queued -= 1
+                self._running += 1
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    self._completed += 1
+        return call
+
+    def _release_abandoned(self, future):
+        with self._lock:
+            self._abandoned -= 1
+
+    async def run(self, fn: Callable[..., Any], *args, timeout: float, **kwargs) -> Any:
+        """Run a blocking call on the pool, giving up on it after `timeout` seconds"""
+        with self._lock:
+            if self._queued + self._running >= self.max_workers + self.max_queue:
+                self._rejected += 1
+                raise LLMExecutorSaturated(
+                    f"LLM executor saturated: {self._running} running, {self._queued} queued"
+                )
+            self._queued += 1
+
+        future = self._executor.submit(self._wrap(fn, *args, **kwargs))
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout=timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            timed_out = isinstance(e, asyncio.TimeoutError)
+            with self._lock:
+                if timed_out:
+                    self._timed_out += 1
+                else:
+                    self._cancelled += 1
+            if future.cancel():
+                # Never started, so it never held a thread
+                with self._lock:
+                    self._queued -= 1
+            elif not future.done():
+                # Already running; the thread stays busy until the client call returns
+                with self._lock:
+                    self._abandoned += 1
+                future.add_done_callback(self._release_abandoned)
+                logger.warning(f"LLM call abandoned after {'timeout' if timed_out else 'cancellation'}; its worker thread is still busy")
+            raise
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "running": self._running,
+                "queued": self._queued,
+                "abandoned": self._abandoned,
+                "utilization": round(self._running / self.max_workers, 3),
+                "completed": self._completed,
+                "timed_out": self._timed_out,
+                "cancelled": self._cancelled,
+                "rejected": self._rejected
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,107 @@
+import hashlib
+import random
+import re
+from typing import Dict, Hashable, List, Optional, Set, Tuple
+
+_WORD_PATTERN = re.compile(r"\w+")
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+NUM_PERMUTATIONS = 64
+LSH_BANDS = 16  # 16 bands x 4 rows: pairs above ~0.5 Jaccard become candidates
+SHINGLE_SIZE = 3
+DUPLICATE_THRESHOLD = 0.6
+
+# Fixed seed so signatures are stable across processes and restarts
+_rng = random.Random(1729)
+_PERMUTATIONS = [
+    (_rng.randint(1, _MERSENNE_PRIME - 1), _rng.randint(0, _MERSENNE_PRIME - 1))
+    for _ in range(NUM_PERMUTATIONS)
+]
+
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> Set[str]:
+    """Word n-grams of the normalized text"""
+    words = _WORD_PATTERN.findall(text.lower())
+    if len(words) <= size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def minhash(text: str) -> List[int]:
+    """MinHash signature of the text's shingles"""
+    hashes = [
+        int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+        for shingle in shingles(text)
+    ]
+    if not hashes:
+        return [_MAX_HASH] * NUM_PERMUTATIONS
+    return [
+        min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes)
+        for a, b in _PERMUTATIONS
+    ]
+
+
+def estimated_similarity(first: List[int], second: List[int]) -> float:
+    """Estimated Jaccard similarity of two signatures"""
+    return sum(1 for x, y in zip(first, second) if x == y) / NUM_PERMUTATIONS
+
+
+class NearDuplicateIndex:
+    """Incremental MinHash/LSH index of question texts"""
+
+    def __init__(self, threshold: float = DUPLICATE_THRESHOLD):
+        self.threshold = threshold
+        self._rows = NUM_PERMUTATIONS // LSH_BANDS
+        self._signatures: Dict[Hashable, List[int]] = {}
+        self._buckets: Dict[Tuple[int, Tuple[int, ...]], Set[Hashable]] = {}
+
+    def __len__(self):
+        return len(self._signatures)
+
+    def _band_keys(self, signature: List[int]):
+        for band in range(LSH_BANDS):
+            yield band, tuple(signature[band * self._rows:(band + 1) * self._rows])
+
+    def add(self, key: Hashable, text: str):
+        self._add_signature(key, minhash(text))
+
+    def _add_signature(self, key: Hashable, signature: List[int]):
+        self._signatures[key] = signature
+        for band_key in self._band_keys(signature):
+            self._buckets.setdefault(band_key, set()).add(key)
+
+    def remove(self, key: Hashable):
+        signature = self._signatures.pop(key, None)
+        if signature is None:
+            return
+        for band_key in self._band_keys(signature):
+            bucket = self._buckets.get(band_key)
+            if bucket:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[band_key]
+
+    def find_duplicate(self, text: str) -> Optional[Tuple[Hashable, float]]:
+        """Most similar indexed key at or above the threshold, with its similarity"""
+        return self._find_signature(minhash(text))
+
+    def _find_signature(self, signature: List[int]) -> Optional[Tuple[Hashable, float]]:
+        candidates = set()
+        for band_key in self._band_keys(signature):
+            candidates.update(self._buckets.get(band_key, ()))
+
+        best = None
+        for key in candidates:
+            similarity = estimated_similarity(signature, self._signatures[key])
+            if similarity >= self.threshold and (best is None or similarity > best[1]):
+                best = (key, similarity)
+        return best
+
+    def check_and_add(self, key: Hashable, text: str) -> Optional[Tuple[Hashable, float]]:
+        """Index the text unless it near-duplicates an existing entry; returns that entry if so"""
+        signature = minhash(text)
+        duplicate = self._find_signature(signature)
+        if duplicate is None:
+            self._add_signature(key, signature)
+        return duplicate
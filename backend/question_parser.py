@@ -0,0 +1,105 @@
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+QUESTIONS_KEY = '"questions"'
+
+
+class IncrementalQuestionParser:
+    """Incremental parser for the {"questions": [...]} response shape
+
+    Feed text as it arrives; each question object is returned as soon as its
+    closing brace is seen, so a truncated payload still yields every complete
+    item. Code fences or stray text around the JSON are skipped.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._pos = 0
+        self._array_started = False
+        self._done = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._item_start: Optional[int] = None
+        self.skipped = 0  # Objects that closed but were not valid JSON
+
+    @property
+    def complete(self) -> bool:
+        """Whether the questions array was closed"""
+        return self._done
+
+    def _find_array_start(self, allow_bare_array: bool) -> Optional[int]:
+        key = self._buffer.find(QUESTIONS_KEY)
+        if key >= 0:
+            start = self._buffer.find("[", key + len(QUESTIONS_KEY))
+            return start if start >= 0 else None
+        if allow_bare_array:
+            start = self._buffer.find("[")
+            return start if start >= 0 else None
+        return None
+
+    def feed(self, text: str, final: bool = False) -> List[Dict[str, Any]]:
+        """Consume more response text and return the question objects completed by it
+
+        With `final`, a response without a "questions" key falls back to its first array.
+        """
+        self._buffer += text
+        items = []
+        if not self._array_started:
+            start = self._find_array_start(allow_bare_array=final)
+            if start is None:
+                return items
+            self._array_started = True
+            self._pos = start + 1
+
+        buffer = self._buffer
+        i = self._pos
+        while i < len(buffer) and not self._done:
+            ch = buffer[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch == "{" or ch == "[":
+                if self._depth == 0 and ch == "{":
+                    self._item_start = i
+                self._depth += 1
+            elif ch == "}" or ch == "]":
+                if self._depth == 0:
+                    self._done = ch == "]"
+                else:
+                    self._depth -= 1
+                    if self._depth == 0 and self._item_start is not None:
+                        try:
+                            item = json.loads(buffer[self._item_start:i + 1])
+                        except json.JSONDecodeError:
+                            item = None
+                        if isinstance(item, dict):
+                            items.append(item)
+                        else:
+                            self.skipped += 1
+                        self._item_start = None
+            i += 1
+
+        # Drop consumed text so memory stays bounded by one in-progress item
+        keep_from = self._item_start if self._item_start is not None else i
+        self._buffer = buffer[keep_from:]
+        self._pos = i - keep_from
+        if self._item_start is not None:
+            self._item_start = 0
+        return items
+
+
+def salvage_questions(response_text: str) -> Tuple[List[Dict[str, Any]], bool]:
+    """Parse every complete question object from a possibly truncated response
+
+    Returns the questions and whether the payload was complete.
+    """
+    parser = IncrementalQuestionParser()
+    questions = parser.feed(response_text, final=True)
+    return questions, parser.complete
@@ -0,0 +1,198 @@
+import json
+import math
+from abc import ABC, abstractmethod
+import os
+import random
+import re
+import threading
+import time
+from typing import Optional
+
+
+class ProviderQuotaError(Exception):
+    """The provider refused the call because a quota or rate limit was hit"""
+
+
+class ProviderResponse:
+    """Raw text returned by a provider plus the output tokens it billed, if known"""
+
+    def __init__(self, text: str, output_tokens: Optional[int] = None):
+        self.text = text
+        self.output_tokens = output_tokens
+
+
+class QuestionProvider(ABC):
+    """Blocking LLM backend used by chunk generation; calls run on the LLM executor"""
+
+    name = "base"
+    model_name = ""
+
+    @abstractmethod
+    def generate(self, prompt: str) -> ProviderResponse:
+        """Return the raw response text for one question-generation prompt"""
+
+
+class GeminiQuestionProvider(QuestionProvider):
+    """Google Gemini via google-generativeai"""
+
+    name = "gemini"
+
+    def __init__(self, api_key: str, model_name: str, temperature: float, max_output_tokens: int):
+        import google.generativeai as genai
+        from google.api_core import exceptions as google_exceptions
+
+        self._genai = genai
+        self._quota_errors = (google_exceptions.ResourceExhausted, google_exceptions.TooManyRequests)
+        self.model_name = model_name
+        self.temperature = temperature
+        self.max_output_tokens = max_output_tokens
+
+        genai.configure(api_key=api_key)
+
+        # Configure the model with better settings for reliability
+        generation_config = genai.types.GenerationConfig(
+            temperature=0.7,
+            top_p=0.8,
+            top_k=40,
+            max_output_tokens=8192,
+        )
+
+        safety_settings = [
+            {
+                "category": "HARM_CATEGORY_HARASSMENT",
+                "threshold": "BLOCK_MEDIUM_AND_ABOVE"
+            },
+            {
+                "category": "HARM_CATEGORY_HATE_SPEECH",
+                "threshold": "BLOCK_MEDIUM_AND_ABOVE"
+            },
+            {
+                "category": "HARM_CATEGORY_SEXUALLY_EXPLICIT",
+                "threshold": "BLOCK_MEDIUM_AND_ABOVE"
+            },
+            {
+                "category": "HARM_CATEGORY_DANGEROUS_CONTENT",
+                "threshold": "BLOCK_MEDIUM_AND_ABOVE"
+            }
+        ]
+
+        self._model = genai.GenerativeModel(
+            model_name,
+            generation_config=generation_config,
+            safety_settings=safety_settings
+        )
+
+    def generate(self, prompt: str) -> ProviderResponse:
+        try:
+            response = self._model.generate_content(
+                prompt,
+                generation_config=self._genai.types.GenerationConfig(
+                    temperature=self.temperature,
+                    max_output_tokens=self.max_output_tokens,
+                )
+            )
+        except self._quota_errors as e:
+            raise ProviderQuotaError(str(e)) from e
+
+        if not response or not response.text:
+            return ProviderResponse("")
+        usage = getattr(response, "usage_metadata", None)
+        return ProviderResponse(response.text, getattr(usage, "candidates_token_count", None) if usage else None)
+
+
+_FAKE_VOCABULARY = (
+    "velocity acceleration momentum torque friction pendulum spring capacitor resistor inductor "
+    "magnetic electric potential entropy enthalpy equilibrium catalyst oxidation reduction isomer "
+    "polymer alkene benzene molarity titration electrolysis enzyme chromosome mitosis meiosis "
+    "photosynthesis respiration hormone neuron ecosystem mutation allele genotype integral derivative "
+    "matrix determinant probability parabola ellipse hyperbola vector logarithm sequence binomial "
+    "wavelength frequency refraction lens mirror orbit satellite nucleus isotope decay circuit"
+).split()
+
+
+class FakeQuestionProvider(QuestionProvider):
+    """Deterministic offline provider for tests and benchmarks
+
+    Latency is log-normal around `latency_median` seconds. Each call may, at the
+    configured rates, raise a quota error, truncate its JSON, corrupt it, or
+    include questions the validator must reject.
+    """
+
+    name = "fake"
+    model_name = "fake-question-model"
+
+    def __init__(self, seed: int = 0, latency_median: float = 2.0, latency_sigma: float = 0.5,
+                 truncation_rate: float = 0.0, malformed_rate: float = 0.0,
+                 quota_error_rate: float = 0.0, rejection_rate: float = 0.0):
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._serial = 0
+        self.latency_median = latency_median
+        self.latency_sigma = latency_sigma
+        self.truncation_rate = truncation_rate
+        self.malformed_rate = malformed_rate
+        self.quota_error_rate = quota_error_rate
+        self.rejection_rate = rejection_rate
+
+    @classmethod
+    def from_env(cls) -> "FakeQuestionProvider":
+        return cls(
+            seed=int(os.environ.get('FAKE_PROVIDER_SEED', '0')),
+            latency_median=float(os.environ.get('FAKE_PROVIDER_LATENCY_MEDIAN', '2.0')),
+            latency_sigma=float(os.environ.get('FAKE_PROVIDER_LATENCY_SIGMA', '0.5')),
+            truncation_rate=float(os.environ.get('FAKE_PROVIDER_TRUNCATION_RATE', '0')),
+            malformed_rate=float(os.environ.get('FAKE_PROVIDER_MALFORMED_RATE', '0')),
+            quota_error_rate=float(os.environ.get('FAKE_PROVIDER_QUOTA_ERROR_RATE', '0')),
+            rejection_rate=float(os.environ.get('FAKE_PROVIDER_REJECTION_RATE', '0'))
+        )
+
+    def _field(self, prompt: str, pattern: str, default: str) -> str:
+        match = re.search(pattern, prompt)
+        return match.group(1) if match else default
+
+    def _question(self, rng: random.Random, serial: int, subject: str, difficulty: str, exam_type: str) -> dict:
+        words = " ".join(rng.choice(_FAKE_VOCABULARY) for _ in range(14))
+        question = f"Case {serial}: considering {words}, which statement about {subject} holds?"
+        if rng.random() < self.rejection_rate:
+            question = f"Sample {subject} question {serial} for {exam_type}"
+        correct_index = rng.randrange(4)
+        return {
+            "question": question,
+            "options": [f"{rng.choice(_FAKE_VOCABULARY)} value {rng.randint(1, 999)}" for _ in range(4)],
+            "correct_index": correct_index,
+            "correct_answer": "ABCD"[correct_index],
+            "solution": f"Apply the {rng.choice(_FAKE_VOCABULARY)} relation step by step to reach option {'ABCD'[correct_index]}.",
+            "difficulty": difficulty,
+            "subject": subject,
+            "topic": rng.choice(_FAKE_VOCABULARY).title(),
+            "exam_type": exam_type
+        }
+
+    def generate(self, prompt: str) -> ProviderResponse:
+        count = int(self._field(prompt, r"Generate exactly (\d+)", "5"))
+        subject = self._field(prompt, r'"subject": "([^"]+)"', "Physics")
+        difficulty = self._field(prompt, r'"difficulty": "([^"]+)"', "Medium")
+        exam_type = self._field(prompt, r'"exam_type": "([^"]+)"', "JEE Main")
+
+        with self._lock:
+            # Draw everything for this call up front so results depend only on the seed and call order
+            rng = random.Random(self._random.getrandbits(64))
+            serial = self._serial
+            self._serial += count
+
+        time.sleep(self.latency_median * math.exp(self.latency_sigma * rng.gauss(0, 1)))
+
+        if rng.random() < self.quota_error_rate:
+            raise ProviderQuotaError("429 Resource has been exhausted (e.g. check quota).")
+
+        questions = [self._question(rng, serial + i, subject, difficulty, exam_type) for i in range(count)]
+        text = "```json\n" + json.dumps({"questions": questions}, indent=2) + "\n```"
+        output_tokens = len(text) // 4
+
+        if rng.random() < self.truncation_rate:
+            text = text[:rng.randint(len(text) // 2, len(text) - 1)]
+        elif rng.random() < self.malformed_rate:
+            cut = rng.randint(len(text) // 4, len(text) // 2)
+            text = text[:cut] + "}{,]" + text[cut:]
+
+        return ProviderResponse(text, output_tokens)
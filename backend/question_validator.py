@@ -0,0 +1,100 @@
+import re
+from typing import Any, Dict, List, NamedTuple
+
+# Phrases that mark sample/template output rather than a real exam question (matched case-insensitively)
+FORBIDDEN_PHRASES = [
+    "sample",
+    "question 1",
+    "question 2",
+    "option a for",
+    "option b for",
+    "option c for",
+    "option d for",
+    "placeholder",
+    "example question",
+    "template",
+    "sample physics",
+    "sample chemistry",
+    "sample mathematics",
+    "sample biology",
+    "for neet",
+    "for jee",
+    "for eamcet"
+]
+
+# One pass over each field; longer phrases first so the most specific match is reported
+_FORBIDDEN_PATTERN = re.compile(
+    "|".join(re.escape(phrase) for phrase in sorted(set(FORBIDDEN_PHRASES), key=len, reverse=True))
+)
+
+# "Option A", "option a", ... only flagged at their own position, as in "Option A for question 1"
+_GENERIC_OPTION_PATTERNS = [(f"Option {chr(65 + i)}", f"option {chr(97 + i)}") for i in range(4)]
+
+MIN_QUESTION_WORDS = 10
+MIN_OPTION_WORDS = 2
+MIN_SOLUTION_WORDS = 5
+
+
+class Rejection(NamedTuple):
+    """Why a question failed validation"""
+    code: str    # forbidden_phrase, question_too_short, option_count, generic_option, option_too_short, solution_too_short
+    field: str   # question, options[i], options, solution
+    detail: str
+
+    def __str__(self):
+        return f"{self.field}: {self.detail}"
+
+
+def find_forbidden_phrase(text: str) -> str:
+    """Return the first forbidden phrase in `text`, or an empty string"""
+    match = _FORBIDDEN_PATTERN.search(text.lower())
+    return match.group(0) if match else ""
+
+
+def validate_question(q_data: Dict[str, Any], min_question_words: int = MIN_QUESTION_WORDS,
+                      collect_all: bool = False) -> List[Rejection]:
+    """Check a generated question dict; an empty list means it is valid
+
+    Stops at the first problem unless `collect_all` is set.
+    """
+    rejections = []
+
+    def reject(code: str, field: str, detail: str) -> bool:
+        rejections.append(Rejection(code, field, detail))
+        return not collect_all
+
+    question_text = str(q_data.get("question", "")).strip()
+    options = q_data.get("options", []) or []
+    solution = str(q_data.get("solution", "")).strip()
+    option_texts = [str(option).strip() for option in options]
+
+    phrase = find_forbidden_phrase(question_text)
+    if phrase and reject("forbidden_phrase", "question", f"Contains forbidden phrase: {phrase}"):
+        return rejections
+
+    for i, option_text in enumerate(option_texts):
+        phrase = find_forbidden_phrase(option_text)
+        if phrase and reject("forbidden_phrase", f"options[{i}]", f"Option contains forbidden phrase: {phrase}"):
+            return rejections
+
+    if len(question_text.split()) < min_question_words:
+        if reject("question_too_short", "question", "Question too short/generic"):
+            return rejections
+
+    if len(option_texts) != 4:
+        if reject("option_count", "options", "Invalid number of options"):
+            return rejections
+
+    for i, option_text in enumerate(option_texts[:4]):
+        upper, lower = _GENERIC_OPTION_PATTERNS[i]
+        if upper in option_text or lower in option_text:
+            if reject("generic_option", f"options[{i}]", f"Generic option pattern detected: {option_text}"):
+                return rejections
+        elif len(option_text.split()) < MIN_OPTION_WORDS:
+            if reject("option_too_short", f"options[{i}]", f"Option too short: {option_text}"):
+                return rejections
+
+    if len(solution.split()) < MIN_SOLUTION_WORDS:
+        reject("solution_too_short", "solution", "Solution too short/generic")
+
+    return rejections
@@ -0,0 +1,136 @@
+import asyncio
+import logging
+import time
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Continuously refilling token bucket; the balance may go negative to absorb under-estimates"""
+
+    def __init__(self, per_minute: float):
+        self.capacity = max(1.0, per_minute)
+        self.rate = self.capacity / 60.0  # tokens per second
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` tokens are available (0 if they are now)"""
+        self._refill()
+        amount = min(amount, self.capacity)  # Oversized requests wait for a full bucket, not forever
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def take(self, amount: float):
+        self._refill()
+        self.tokens -= amount
+
+    def refund(self, amount: float):
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+    def drain(self):
+        self._refill()
+        self.tokens = min(self.tokens, 0.0)
+
+
+class RatePermit:
+    """One admitted call; record actual token usage before the permit is released"""
+
+    def __init__(self, limiter: "AdaptiveRateLimiter", estimated_tokens: int):
+        self._limiter = limiter
+        self.estimated_tokens = estimated_tokens
+        self.tokens_used: Optional[int] = None
+
+    def record_tokens(self, tokens_used: Optional[int]):
+        self.tokens_used = tokens_used
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self._limiter._release(self, exc)
+        return False
+
+
+class AdaptiveRateLimiter:
+    """Process-wide token-bucket budget for requests and output tokens with AIMD concurrency
+
+    Concurrency grows additively while calls succeed and halves when the
+    upstream reports throttling, within [1, max_concurrency].
+    """
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float, max_concurrency: int,
+                 initial_concurrency: Optional[int] = None, is_throttle_error=None):
+        self.requests = TokenBucket(requests_per_minute)
+        self.output_tokens = TokenBucket(tokens_per_minute)
+        self.max_concurrency = max(1, max_concurrency)
+        self.concurrency_limit = float(min(self.max_concurrency, initial_concurrency or max(1, self.max_concurrency // 2)))
+        self._is_throttle_error = is_throttle_error or (lambda exc: False)
+        self._in_flight = 0
+        self._budget_lock = asyncio.Lock()
+        self._slot_freed = asyncio.Condition()
+        self.throttled = 0
+
+    async def acquire(self, estimated_tokens: int) -> RatePermit:
+        """Wait for a concurrency slot and enough request/token budget, then admit the call"""
+        async with self._slot_freed:
+            await self._slot_freed.wait_for(lambda: self._in_flight < int(self.concurrency_limit))
+            self._in_flight += 1
+        try:
+            # Serialize budget checks so waiting callers are admitted in order
+            async with self._budget_lock:
+                while True:
+                    wait = max(self.requests.wait_time(1), self.output_tokens.wait_time(estimated_tokens))
+                    if wait <= 0:
+                        break
+                    await asyncio.sleep(wait)
+                self.requests.take(1)
+                self.output_tokens.take(estimated_tokens)
+        except BaseException:
+            await self._free_slot()
+            raise
+        return RatePermit(self, estimated_tokens)
+
+    async def _free_slot(self):
+        async with self._slot_freed:
+            self._in_flight -= 1
+            self._slot_freed.notify_all()
+
+    async def _release(self, permit: RatePermit, exc: Optional[BaseException]):
+        # Reconcile the output-token estimate with what the call actually used
+        if permit.tokens_used is not None:
+            difference = permit.estimated_tokens - permit.tokens_used
+            if difference > 0:
+                self.output_tokens.refund(difference)
+            else:
+                self.output_tokens.take(-difference)
+
+        if exc is None:
+            # Additive increase: roughly +1 slot per window of successful calls
+            self.concurrency_limit = min(self.max_concurrency, self.concurrency_limit + 1 / self.concurrency_limit)
+        elif self._is_throttle_error(exc):
+            # Multiplicative decrease and drain the request bucket so everyone backs off
+            self.throttled += 1
+            self.concurrency_limit = max(1.0, self.concurrency_limit / 2)
+            self.requests.drain()
+            logger.warning(f"Upstream throttled; concurrency limit reduced to {int(self.concurrency_limit)}")
+
+        await self._free_slot()
+
+    def stats(self) -> dict:
+        return {
+            "concurrency_limit": int(self.concurrency_limit),
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self._in_flight,
+            "request_budget": round(self.requests.tokens, 2),
+            "output_token_budget": round(self.output_tokens.tokens),
+            "throttled": self.throttled
+        }
@@ -1,24 +1,41 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status, Request
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, status, Request, Query
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
+from fastapi.encoders import jsonable_encoder
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
 from pydantic import BaseModel, Field, EmailStr
-from typing import List, Optional, Dict, Any
+from typing import List, Literal, Optional, Dict, Any
 import os
 import uuid
 import json
+import base64
+import hashlib
 import logging
 from datetime import datetime, timedelta
 from pathlib import Path
 from dotenv import load_dotenv
-import google.generativeai as genai
 from tenacity import retry, stop_after_attempt, wait_exponential
 import jwt
-import bcrypt
-from google.auth.transport import requests
-from google.oauth2 import id_token
+from google.auth import jwt as google_jwt
 import httpx
 import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+
+from llm_executor import LLMExecutor
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+from index_manager import IndexManager, IndexSpec
+from google_certs import GOOGLE_ISSUERS, GOOGLE_OAUTH2_CERTS_URL, GoogleCertCache, GoogleCertsUnavailable
+from password_hasher import PasswordHasher, PasswordHasherSaturated
+from rate_limiter import AdaptiveRateLimiter
+from question_validator import validate_question
+from question_dedup import NearDuplicateIndex
+from question_parser import salvage_questions
+from question_providers import QuestionProvider, GeminiQuestionProvider, FakeQuestionProvider, ProviderQuotaError, ProviderResponse
 
 # Load environment variables
 ROOT_DIR = Path(__file__).parent
@@ -38,41 +55,25 @@ mongo_url = os.environ['MONGO_URL']
 client = AsyncIOMotorClient(mongo_url)
 db = client[os.environ['DB_NAME']]
 
-# Gemini AI Configuration
-genai.configure(api_key=os.environ['GEMINI_API_KEY'])
+# Question provider configuration
+QUESTION_PROVIDER = os.environ.get('QUESTION_PROVIDER', 'gemini')  # gemini, fake
+GEMINI_MODEL_NAME = "gemini-2.0-flash"
 
-# Configure the model with better settings for reliability
-generation_config = genai.types.GenerationConfig(
-    temperature=0.7,
-    top_p=0.8,
-    top_k=40,
-    max_output_tokens=8192,
-)
+# Per-chunk generation settings
+CHUNK_TEMPERATURE = 0.5  # Reduced temperature for more consistent, quality responses
+CHUNK_MAX_OUTPUT_TOKENS = 8192
 
-safety_settings = [
-    {
-        "category": "HARM_CATEGORY_HARASSMENT",
-        "threshold": "BLOCK_MEDIUM_AND_ABOVE"
-    },
-    {
-        "category": "HARM_CATEGORY_HATE_SPEECH",
-        "threshold": "BLOCK_MEDIUM_AND_ABOVE"
-    },
-    {
-        "category": "HARM_CATEGORY_SEXUALLY_EXPLICIT",
-        "threshold": "BLOCK_MEDIUM_AND_ABOVE"
-    },
-    {
-        "category": "HARM_CATEGORY_DANGEROUS_CONTENT",
-        "threshold": "BLOCK_MEDIUM_AND_ABOVE"
-    }
-]
+def create_question_provider() -> QuestionProvider:
+    if QUESTION_PROVIDER == "fake":
+        return FakeQuestionProvider.from_env()
+    return GeminiQuestionProvider(
+        api_key=os.environ['GEMINI_API_KEY'],
+        model_name=GEMINI_MODEL_NAME,
+        temperature=CHUNK_TEMPERATURE,
+        max_output_tokens=CHUNK_MAX_OUTPUT_TOKENS
+    )
 
-model = genai.GenerativeModel(
-    "gemini-2.0-flash",
-    generation_config=generation_config,
-    safety_settings=safety_settings
-)
+question_provider = create_question_provider()
 
 # JWT Configuration
 JWT_SECRET = os.environ['JWT_SECRET_KEY']
@@ -92,7 +93,7 @@ class User(BaseModel):
     google_id: Optional[str] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
     last_login: Optional[datetime] = None
-    active_sessions: List[dict] = Field(default_factory=list)  # Track active sessions with device info
+    active_sessions: List[dict] = Field(default_factory=list)  # Always empty; sessions live in db.sessions
 
 class UserRegistration(BaseModel):
     email: EmailStr
@@ -116,6 +117,7 @@ class ExamConfig(BaseModel):
     question_count: int
     duration: int  # in minutes
     difficulty: str  # Easy, Medium, Hard, Mixed
+    generation_cache: Literal["use", "bypass", "refresh"] = "use"
 
 class Question(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -129,16 +131,32 @@ class Question(BaseModel):
     topic: str
     exam_type: str
 
+class DeliveryQuestion(BaseModel):
+    """What a candidate sees of a question; answers and solutions live in the exam's answer key"""
+    id: str
+    question: str
+    options: List[str]
+    difficulty: str
+    subject: str
+    topic: str
+    exam_type: str
+
+class AnswerKeyEntry(BaseModel):
+    question_id: str
+    correct_index: int
+    correct_answer: str
+    solution: str
+
 class Exam(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     user_id: str
     exam_type: str
     configuration: ExamConfig
-    questions: List[Question]
+    questions: List[DeliveryQuestion]
     start_time: Optional[datetime] = None
     end_time: Optional[datetime] = None
     duration: int
-    status: str = "created"  # created, ongoing, completed, submitted
+    status: str = "created"  # generating, failed, created, ongoing, completed, submitted
     answers: Dict[str, Any] = {}
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
@@ -158,12 +176,24 @@ class ExamResult(BaseModel):
     detailed_analysis: List[Dict[str, Any]]
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
+# Password hashing runs on its own process pool so bcrypt never blocks the event loop
+BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', '12'))
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', str(max(1, (os.cpu_count() or 2) // 2))))
+PASSWORD_HASH_QUEUE = int(os.environ.get('PASSWORD_HASH_QUEUE', '64'))
+password_hasher = PasswordHasher(BCRYPT_ROUNDS, PASSWORD_HASH_WORKERS, PASSWORD_HASH_QUEUE)
+
 # Utility Functions
-def hash_password(password: str) -> str:
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+async def hash_password(password: str) -> str:
+    try:
+        return await password_hasher.hash(password)
+    except PasswordHasherSaturated:
+        raise HTTPException(status_code=503, detail="Too many sign-in requests, please try again shortly", headers={"Retry-After": "1"})
 
-def verify_password(password: str, hashed: str) -> bool:
-    return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+async def verify_password(password: str, hashed: str) -> bool:
+    try:
+        return await password_hasher.verify(password, hashed)
+    except PasswordHasherSaturated:
+        raise HTTPException(status_code=503, detail="Too many sign-in requests, please try again shortly", headers={"Retry-After": "1"})
 
 def create_jwt_token(user_id: str, email: str, session_id: str = None) -> str:
     payload = {
@@ -175,14 +205,61 @@ def create_jwt_token(user_id: str, email: str, session_id: str = None) -> str:
     }
     return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
 
+# Recently verified tokens, so hot clients skip signature checks until the token expires
+JWT_CACHE_MAX_ENTRIES = int(os.environ.get('JWT_CACHE_MAX_ENTRIES', '10000'))
+
+class VerifiedTokenCache:
+    """Bounded LRU of decoded JWT payloads keyed by a hash of the token"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._payloads: "OrderedDict[bytes, dict]" = OrderedDict()
+
+    def get(self, token: str) -> Optional[dict]:
+        key = hashlib.sha256(token.encode("utf-8")).digest()
+        payload = self._payloads.get(key)
+        if payload is None:
+            return None
+        if payload.get("exp", 0) <= time.time():
+            del self._payloads[key]
+            return None
+        self._payloads.move_to_end(key)
+        return payload
+
+    def put(self, token: str, payload: dict):
+        if self.max_entries <= 0 or "exp" not in payload:
+            return
+        self._payloads[hashlib.sha256(token.encode("utf-8")).digest()] = payload
+        while len(self._payloads) > self.max_entries:
+            self._payloads.popitem(last=False)
+
+verified_tokens = VerifiedTokenCache(JWT_CACHE_MAX_ENTRIES)
+
 def decode_jwt_token(token: str) -> dict:
+    payload = verified_tokens.get(token)
+    if payload is not None:
+        return payload
     try:
         payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
-        return payload
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token expired")
-    except jwt.JWTError:
+    except jwt.InvalidTokenError:
         raise HTTPException(status_code=401, detail="Invalid token")
+    verified_tokens.put(token, payload)
+    return payload
+
+# Google sign-in: certificates are cached and refreshed in the background, never fetched on the request path
+GOOGLE_CERTS_URL = os.environ.get('GOOGLE_CERTS_URL', GOOGLE_OAUTH2_CERTS_URL)
+google_certs = GoogleCertCache(GOOGLE_CERTS_URL)
+
+async def verify_google_id_token(token: str, audience: str) -> dict:
+    """Verify a Google ID token's signature, audience, expiry and issuer; raises ValueError if invalid"""
+    certs = await google_certs.certs_for(token)
+    # RSA verification is CPU work; keep it off the event loop
+    id_info = await asyncio.to_thread(google_jwt.decode, token, certs=certs, audience=audience)
+    if id_info.get("iss") not in GOOGLE_ISSUERS:
+        raise ValueError(f"Wrong issuer: {id_info.get('iss')}")
+    return id_info
 
 def get_device_info(request) -> dict:
     """Extract device information from request headers"""
@@ -216,349 +293,807 @@ def get_device_info(request) -> dict:
         "login_time": datetime.utcnow()
     }
 
+# Activity timestamps are coalesced in memory and written in batches
+ACTIVITY_FLUSH_INTERVAL = float(os.environ.get('ACTIVITY_FLUSH_INTERVAL', '30'))  # seconds
+
+class TimestampWriteBehind:
+    """Coalesces per-document timestamp updates and flushes them with one bulk_write
+
+    Only the latest timestamp per key is kept; $max makes flushes order-independent
+    and safe to retry.
+    """
+
+    def __init__(self, collection: str, key_field: str, field: str):
+        self.collection = collection
+        self.key_field = key_field
+        self.field = field
+        self._pending: Dict[str, datetime] = {}
+        self.flushed = 0
+
+    def touch(self, key: str, at: Optional[datetime] = None):
+        at = at or datetime.utcnow()
+        current = self._pending.get(key)
+        if current is None or at > current:
+            self._pending[key] = at
+
+    def pending(self, key: str) -> Optional[datetime]:
+        """Latest timestamp not yet written for `key`"""
+        return self._pending.get(key)
+
+    async def flush(self):
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, {}
+        try:
+            await db[self.collection].bulk_write(
+                [UpdateOne({self.key_field: key}, {"$max": {self.field: at}}) for key, at in batch.items()],
+                ordered=False
+            )
+            self.flushed += len(batch)
+        except Exception as e:
+            logger.error(f"Failed to flush {len(batch)} {self.collection}.{self.field} updates: {str(e)}")
+            for key, at in batch.items():
+                self.touch(key, at)
+
+session_activity = TimestampWriteBehind("sessions", "session_id", "last_activity")
+login_times = TimestampWriteBehind("users", "id", "last_login")
+activity_flush_task: Optional[asyncio.Task] = None
+
+async def flush_activity():
+    await session_activity.flush()
+    await login_times.flush()
+
+async def activity_flush_worker():
+    """Background loop writing buffered activity timestamps"""
+    while True:
+        await asyncio.sleep(ACTIVITY_FLUSH_INTERVAL)
+        await flush_activity()
+
 async def manage_user_sessions(user_id: str, session_id: str, device_info: dict, max_sessions: int = 1):
-    """Manage user sessions, keeping only the most recent ones"""
-    user = await db.users.find_one({"id": user_id})
-    if not user:
-        return
-    
-    # Get current sessions
-    active_sessions = user.get("active_sessions", [])
-    
-    # For single session limit (max_sessions=1), clear all previous sessions
-    if max_sessions == 1:
-        active_sessions = []  # Clear all existing sessions
-    else:
-        # For multiple sessions, remove old ones if we're at the limit
-        if len(active_sessions) >= max_sessions:
-            # Keep only the most recent sessions (remove oldest)
-            active_sessions = active_sessions[-(max_sessions-1):]
-    
-    # Add new session
-    new_session = {
+    """Record a new session and drop the user's older ones beyond `max_sessions`
+
+    Each session is its own document, so concurrent logins never overwrite each other;
+    every login prunes down to the newest `max_sessions`, which converges under races.
+    """
+    now = datetime.utcnow()
+    await db.sessions.insert_one({
         "session_id": session_id,
+        "user_id": user_id,
         "device_info": device_info,
-        "created_at": datetime.utcnow(),
-        "last_activity": datetime.utcnow()
-    }
-    active_sessions.append(new_session)
+        "created_at": now,
+        "last_activity": now,
+        "expires_at": now + timedelta(hours=JWT_EXPIRATION)  # Same lifetime as the JWT
+    })
     
-    # Update user's active sessions
-    await db.users.update_one(
-        {"id": user_id},
-        {"$set": {"active_sessions": active_sessions, "last_login": datetime.utcnow()}}
-    )
+    keep = await db.sessions.find({"user_id": user_id}, {"_id": 0, "session_id": 1}) \
+        .sort("created_at", -1).limit(max(1, max_sessions)).to_list(length=max(1, max_sessions))
+    await revoke_user_sessions(user_id, exclude=[session_id] + [doc["session_id"] for doc in keep])
+    
+    login_times.touch(user_id, now)
 
-async def is_session_valid(user_id: str, session_id: str) -> bool:
-    """Check if a session is still valid"""
-    user = await db.users.find_one({"id": user_id})
-    if not user:
-        return False
+class RevokedSessions:
+    """In-memory set of revoked session ids, each kept until its token would have expired anyway"""
+
+    def __init__(self):
+        self._expiry: Dict[str, datetime] = {}
+        self._purge_at = 1024
+
+    def __contains__(self, session_id: Optional[str]) -> bool:
+        expires_at = self._expiry.get(session_id)
+        return expires_at is not None and expires_at > datetime.utcnow()
+
+    def __len__(self):
+        return len(self._expiry)
+
+    def add(self, session_id: str, expires_at: datetime):
+        self._expiry[session_id] = expires_at
+        if len(self._expiry) >= self._purge_at:
+            now = datetime.utcnow()
+            self._expiry = {sid: exp for sid, exp in self._expiry.items() if exp > now}
+            self._purge_at = max(1024, len(self._expiry) * 2)
+
+revoked_sessions = RevokedSessions()
+
+async def revoke_user_sessions(user_id: str, exclude: Optional[List[str]] = None):
+    """Delete a user's sessions (except `exclude`) and remember them as revoked"""
+    query = {"user_id": user_id}
+    if exclude:
+        query["session_id"] = {"$nin": exclude}
+    sessions = await db.sessions.find(query, {"_id": 0, "session_id": 1, "expires_at": 1}).to_list(length=None)
+    if sessions:
+        session_ids = [session["session_id"] for session in sessions]
+        await db.sessions.delete_many({"session_id": {"$in": session_ids}})
+        await db.revoked_sessions.insert_many([
+            {"session_id": session["session_id"], "expires_at": session["expires_at"]}
+            for session in sessions
+        ])
+        for session in sessions:
+            revoked_sessions.add(session["session_id"], session["expires_at"])
+    session_user_cache.invalidate_user(user_id)
+
+async def load_revoked_sessions():
+    """Reload revocations that have not expired yet, including ones made by other processes"""
+    cursor = db.revoked_sessions.find({"expires_at": {"$gt": datetime.utcnow()}}, {"_id": 0})
+    async for doc in cursor:
+        revoked_sessions.add(doc["session_id"], doc["expires_at"])
+    logger.info(f"Loaded {len(revoked_sessions)} revoked sessions")
+
+# Authenticated users by (user_id, session_id); entries are dropped whenever the user's sessions change
+AUTH_CACHE_TTL_SECONDS = float(os.environ.get('AUTH_CACHE_TTL_SECONDS', '15'))
+AUTH_CACHE_MAX_ENTRIES = int(os.environ.get('AUTH_CACHE_MAX_ENTRIES', '10000'))
+
+class SessionUserCache:
+    """Short-lived in-process cache of users resolved from valid sessions
+
+    Invalidation only reaches this process; other workers keep a stale entry for at most the TTL.
+    """
+
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()  # (user_id, session_id) -> (expires_at, user)
+        self._keys_by_user: Dict[str, set] = {}
+
+    def get(self, user_id: str, session_id: Optional[str]) -> Optional[User]:
+        key = (user_id, session_id)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            self._drop(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def put(self, user_id: str, session_id: Optional[str], user: User):
+        if self.ttl <= 0:
+            return
+        key = (user_id, session_id)
+        self._entries[key] = (time.monotonic() + self.ttl, user)
+        self._entries.move_to_end(key)
+        self._keys_by_user.setdefault(user_id, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            self._drop(next(iter(self._entries)))
+
+    def invalidate_user(self, user_id: str):
+        for key in self._keys_by_user.pop(user_id, set()):
+            self._entries.pop(key, None)
+
+    def _drop(self, key: tuple):
+        self._entries.pop(key, None)
+        keys = self._keys_by_user.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_user[key[0]]
+
+session_user_cache = SessionUserCache(AUTH_CACHE_TTL_SECONDS, AUTH_CACHE_MAX_ENTRIES)
+
+# Fields the auth layer never needs; sessions are matched in the query instead
+AUTH_USER_PROJECTION = {"_id": 0, "password": 0, "active_sessions": 0}
+
+async def find_session_user(user_id: str, session_id: Optional[str]) -> Optional[dict]:
+    """Load a user only if the session is still active, in a single round trip"""
+    if not session_id:
+        return await db.users.find_one({"id": user_id}, AUTH_USER_PROJECTION)
     
-    active_sessions = user.get("active_sessions", [])
-    return any(session["session_id"] == session_id for session in active_sessions)
+    # Indexed point lookup on the session, joined to its user; expired sessions may linger until the TTL monitor runs
+    users = await db.sessions.aggregate([
+        {"$match": {"session_id": session_id, "user_id": user_id, "expires_at": {"$gt": datetime.utcnow()}}},
+        {"$limit": 1},
+        {"$lookup": {"from": "users", "localField": "user_id", "foreignField": "id", "as": "user"}},
+        {"$unwind": "$user"},
+        {"$replaceRoot": {"newRoot": "$user"}},
+        {"$project": AUTH_USER_PROJECTION}
+    ]).to_list(length=1)
+    return users[0] if users else None
 
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     payload = decode_jwt_token(credentials.credentials)
-    
-    # Check if session is still valid
+    user_id = payload["user_id"]
     session_id = payload.get("session_id")
-    if session_id and not await is_session_valid(payload["user_id"], session_id):
+    if session_id in revoked_sessions:
         raise HTTPException(status_code=401, detail="Session expired or invalid")
     
-    user = await db.users.find_one({"id": payload["user_id"]})
-    if not user:
-        raise HTTPException(status_code=401, detail="User not found")
-    return User(**user)
+    if session_id:
+        session_activity.touch(session_id)
+    
+    user = session_user_cache.get(user_id, session_id)
+    if user:
+        return user
+    
+    # Missing user and revoked session are indistinguishable here; both are unauthorized
+    user_doc = await find_session_user(user_id, session_id)
+    if not user_doc:
+        raise HTTPException(status_code=401, detail="Session expired or invalid")
+    user = User(**user_doc)
+    session_user_cache.put(user_id, session_id, user)
+    return user
+
+# Gemini call limiting - shared by every request handled in this process
+GEMINI_MAX_CONCURRENCY = int(os.environ.get('GEMINI_MAX_CONCURRENCY', '8'))
+GEMINI_REQUESTS_PER_MINUTE = float(os.environ.get('GEMINI_REQUESTS_PER_MINUTE', '60'))
+GEMINI_OUTPUT_TOKENS_PER_MINUTE = float(os.environ.get('GEMINI_OUTPUT_TOKENS_PER_MINUTE', '240000'))
+GEMINI_TOKENS_PER_QUESTION = 700  # Output-token estimate per generated question, reconciled after each call
+
+def is_quota_error(exc: BaseException) -> bool:
+    """Whether a provider exception means we are being throttled"""
+    return isinstance(exc, ProviderQuotaError)
+
+gemini_limiter = AdaptiveRateLimiter(
+    requests_per_minute=GEMINI_REQUESTS_PER_MINUTE,
+    tokens_per_minute=GEMINI_OUTPUT_TOKENS_PER_MINUTE,
+    max_concurrency=GEMINI_MAX_CONCURRENCY,
+    is_throttle_error=is_quota_error
+)
+
+# Dedicated threads for blocking Gemini client calls, sized with headroom for calls abandoned on timeout
+GEMINI_EXECUTOR_WORKERS = int(os.environ.get('GEMINI_EXECUTOR_WORKERS', str(GEMINI_MAX_CONCURRENCY * 2)))
+GEMINI_EXECUTOR_QUEUE = int(os.environ.get('GEMINI_EXECUTOR_QUEUE', str(GEMINI_MAX_CONCURRENCY)))
+gemini_executor = LLMExecutor(GEMINI_EXECUTOR_WORKERS, GEMINI_EXECUTOR_QUEUE)
+
+# Fail fast while the provider keeps refusing or timing out instead of retrying every chunk
+GEMINI_BREAKER_FAILURE_THRESHOLD = int(os.environ.get('GEMINI_BREAKER_FAILURE_THRESHOLD', '5'))
+GEMINI_BREAKER_RESET_TIMEOUT = float(os.environ.get('GEMINI_BREAKER_RESET_TIMEOUT', '30'))  # seconds
+GEMINI_BREAKER_MAX_RESET_TIMEOUT = float(os.environ.get('GEMINI_BREAKER_MAX_RESET_TIMEOUT', '300'))  # seconds
+
+def is_upstream_failure(exc: BaseException) -> bool:
+    """Whether a provider exception should count towards opening the circuit"""
+    return is_quota_error(exc) or isinstance(exc, asyncio.TimeoutError)
+
+gemini_breaker = CircuitBreaker(
+    "gemini",
+    failure_threshold=GEMINI_BREAKER_FAILURE_THRESHOLD,
+    reset_timeout=GEMINI_BREAKER_RESET_TIMEOUT,
+    max_reset_timeout=GEMINI_BREAKER_MAX_RESET_TIMEOUT,
+    is_failure=is_upstream_failure
+)
+
+# Background exam generation jobs
+generation_tasks = set()  # Strong references so running jobs aren't garbage collected
+GENERATION_JOB_STALE_AFTER = float(os.environ.get('GENERATION_JOB_STALE_AFTER', '300'))  # seconds without progress
+GENERATION_SHUTDOWN_GRACE = float(os.environ.get('GENERATION_SHUTDOWN_GRACE', '10'))  # seconds
+
+class GenerationProgress:
+    """Persists per-subject and per-chunk progress of an exam generation job"""
+
+    def __init__(self, exam_id: str, subjects: List[str]):
+        self.exam_id = exam_id
+        # Subjects are addressed by position so user-supplied names never end up in field paths
+        self._subject_index = {subject: i for i, subject in enumerate(subjects)}
+
+    async def _update(self, update: dict):
+        update.setdefault("$set", {})["updated_at"] = datetime.utcnow()
+        await db.generation_jobs.update_one({"exam_id": self.exam_id}, update)
+
+    def _field(self, subject: str, name: str) -> str:
+        return f"subjects.{self._subject_index[subject]}.{name}"
+
+    async def bank_drawn(self, subject: str, questions: List[Question]):
+        await self._update({"$inc": {
+            self._field(subject, "from_bank"): len(questions),
+            "generated_questions": len(questions)
+        }})
+
+    async def chunks_planned(self, subject: str, chunk_count: int):
+        await self._update({"$inc": {self._field(subject, "chunks_total"): chunk_count}})
+
+    async def chunk_attempt(self, subject: str):
+        # Also the job's heartbeat: a slow chunk must not look abandoned while it is retrying
+        await self._update({"$inc": {self._field(subject, "chunk_attempts"): 1}})
+
+    async def chunk_completed(self, subject: str, questions: List[Question]):
+        await self._update({"$inc": {
+            self._field(subject, "chunks_completed"): 1,
+            self._field(subject, "generated"): len(questions),
+            "generated_questions": len(questions)
+        }})
+
+    async def chunk_failed(self, subject: str, chunk_number: int, error: str):
+        await self._update({
+            "$inc": {self._field(subject, "chunks_failed"): 1},
+            "$push": {"failures": {
+                "subject": subject,
+                "chunk": chunk_number,
+                "error": error,
+                "failed_at": datetime.utcnow()
+            }}
+        })
+
+    async def finished(self, exam: Optional[Exam] = None, error: Optional[str] = None):
+        """Called once generation has succeeded (with the stored exam) or failed"""
+
+class StreamingGenerationProgress(GenerationProgress):
+    """Generation progress that also forwards each completed batch to a streaming client"""
+
+    def __init__(self, exam_id: str, subjects: List[str]):
+        super().__init__(exam_id, subjects)
+        self.events: asyncio.Queue = asyncio.Queue()
+
+    async def bank_drawn(self, subject: str, questions: List[Question]):
+        await super().bank_drawn(subject, questions)
+        self.events.put_nowait({"type": "questions", "subject": subject, "source": "bank", "questions": delivery_questions(questions)})
+
+    async def chunk_completed(self, subject: str, questions: List[Question]):
+        await super().chunk_completed(subject, questions)
+        self.events.put_nowait({"type": "questions", "subject": subject, "source": "generated", "questions": delivery_questions(questions)})
+
+    async def chunk_failed(self, subject: str, chunk_number: int, error: str):
+        await super().chunk_failed(subject, chunk_number, error)
+        self.events.put_nowait({"type": "chunk_failed", "subject": subject, "chunk": chunk_number, "error": error})
+
+    async def finished(self, exam: Optional[Exam] = None, error: Optional[str] = None):
+        if error is not None:
+            self.events.put_nowait({"type": "error", "exam_id": self.exam_id, "error": error})
+        else:
+            self.events.put_nowait({"type": "exam", "exam": exam})
+
+# Near-duplicate detection - stored bank questions are indexed per process
+question_bank_index = NearDuplicateIndex()
+
+def dedup_text(question: Question) -> str:
+    return question.question + " " + " ".join(question.options)
+
+def register_if_unique(question: Question, seen: Optional[NearDuplicateIndex]) -> bool:
+    """Reject near-duplicates of stored bank questions or of questions already in this exam/batch"""
+    text = dedup_text(question)
+    duplicate = question_bank_index.find_duplicate(text)
+    if duplicate is None and seen is not None:
+        duplicate = seen.check_and_add(question.id, text)
+    if duplicate is not None:
+        logger.warning(f"Rejected near-duplicate question (similarity {duplicate[1]:.2f}): {question.question[:100]}...")
+        return False
+    return True
+
+# Adaptive over-generation - ask for more questions where validation rejects more
+MAX_QUESTIONS_PER_CALL = 10
+MAX_TOPUP_ROUNDS = 2
+
+class AcceptanceTracker:
+    """Moving average of the share of requested questions that pass validation, per (subject, difficulty)"""
+
+    def __init__(self, initial: float = 0.9, alpha: float = 0.3, floor: float = 0.4):
+        self._initial = initial
+        self._alpha = alpha
+        self._floor = floor  # Never over-request by more than 1/floor
+        self._rates: Dict[tuple, float] = {}
+
+    def rate(self, subject: str, difficulty: str) -> float:
+        return self._rates.get((subject, difficulty), self._initial)
+
+    def record(self, subject: str, difficulty: str, requested: int, accepted: int):
+        if requested <= 0:
+            return
+        observed = min(1.0, accepted / requested)
+        current = self.rate(subject, difficulty)
+        self._rates[(subject, difficulty)] = current + self._alpha * (observed - current)
+
+    def request_size(self, subject: str, difficulty: str, needed: int) -> int:
+        """How many questions to ask for so that about `needed` survive validation"""
+        rate = max(self._floor, self.rate(subject, difficulty))
+        return max(needed, min(MAX_QUESTIONS_PER_CALL, math.ceil(needed / rate)))
+
+acceptance_tracker = AcceptanceTracker()
+
+# Hedged requests - duplicate a straggling call once it exceeds the subject's p90 latency
+GEMINI_HEDGING_ENABLED = os.environ.get('GEMINI_HEDGING_ENABLED', 'false').lower() == 'true'
+GEMINI_HEDGE_BUDGET = float(os.environ.get('GEMINI_HEDGE_BUDGET', '0.1'))  # Max hedges per primary call
+GEMINI_CALL_TIMEOUT = 90.0  # Increased timeout for better quality generation
+
+class LatencyTracker:
+    """Rolling window of successful call latencies per subject"""
+
+    def __init__(self, window: int = 100, min_samples: int = 20):
+        self._min_samples = min_samples
+        self._window = window
+        self._samples: Dict[str, deque] = {}
+
+    def record(self, subject: str, latency: float):
+        self._samples.setdefault(subject, deque(maxlen=self._window)).append(latency)
+
+    def percentile(self, subject: str, pct: float) -> Optional[float]:
+        samples = self._samples.get(subject)
+        if not samples or len(samples) < self._min_samples:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))]
+
+class HedgeBudget:
+    """Earns `ratio` of a hedge per primary call so hedging never exceeds that share of spend"""
+
+    def __init__(self, ratio: float, burst: float = 5.0):
+        self._ratio = ratio
+        self._burst = burst
+        self._tokens = 0.0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.denied = 0
+
+    def earn(self):
+        self._tokens = min(self._burst, self._tokens + self._ratio)
+
+    def try_spend(self) -> bool:
+        if self._tokens >= 1:
+            self._tokens -= 1
+            self.hedges += 1
+            return True
+        self.denied += 1
+        return False
+
+    def stats(self) -> dict:
+        return {"enabled": GEMINI_HEDGING_ENABLED, "hedges": self.hedges, "hedge_wins": self.hedge_wins, "denied": self.denied}
+
+latency_tracker = LatencyTracker()
+hedge_budget = HedgeBudget(GEMINI_HEDGE_BUDGET)
+
+# Content-addressed cache of validated chunk outputs
+PROMPT_VERSION = "1"  # Bump whenever build_question_prompt changes meaningfully
+GENERATION_CACHE_TTL_HOURS = float(os.environ.get('GENERATION_CACHE_TTL_HOURS', '72'))
+GENERATION_CACHE_MAX_ENTRIES = int(os.environ.get('GENERATION_CACHE_MAX_ENTRIES', '5000'))
+GENERATION_CACHE_MAX_USES = int(os.environ.get('GENERATION_CACHE_MAX_USES', '50'))
+
+def generation_cache_key(subject: str, chunk_count: int, exam_config: ExamConfig) -> str:
+    """Hash of the rendered prompt plus every model setting that affects the output"""
+    material = json.dumps({
+        "prompt_version": PROMPT_VERSION,
+        "prompt": build_question_prompt(subject, chunk_count, exam_config),
+        "provider": question_provider.name,
+        "model": question_provider.model_name,
+        "temperature": CHUNK_TEMPERATURE,
+        "max_output_tokens": CHUNK_MAX_OUTPUT_TOKENS
+    }, sort_keys=True)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+async def generation_cache_lookup(key: str, user_id: Optional[str]) -> List[Question]:
+    """Claim a cached chunk this user has not been served yet"""
+    now = datetime.utcnow()
+    entry = await db.generation_cache.find_one_and_update(
+        {
+            "key": key,
+            "served_to": {"$ne": user_id},
+            "uses": {"$lt": GENERATION_CACHE_MAX_USES},
+            "expires_at": {"$gt": now}
+        },
+        {"$inc": {"uses": 1}, "$addToSet": {"served_to": user_id}, "$set": {"last_used_at": now}},
+        projection={"_id": 0, "questions": 1},
+        sort=[("last_used_at", 1)]
+    )
+    if not entry:
+        return []
+    # Fresh ids so the same cached question never shares an id across exams
+    return [Question(**{**question, "id": str(uuid.uuid4())}) for question in entry["questions"]]
+
+async def generation_cache_store(key: str, questions: List[Question], user_id: Optional[str], replace_before: Optional[datetime] = None):
+    """Store a validated chunk and evict least recently used entries beyond the cap
+
+    With `replace_before`, entries for the key created before then are dropped so
+    lookups stop serving them ahead of the new chunk.
+    """
+    now = datetime.utcnow()
+    if replace_before:
+        await db.generation_cache.delete_many({"key": key, "created_at": {"$lt": replace_before}})
+    await db.generation_cache.insert_one({
+        "key": key,
+        "questions": [question.dict() for question in questions],
+        "uses": 1,
+        "served_to": [user_id],
+        "created_at": now,
+        "last_used_at": now,
+        "expires_at": now + timedelta(hours=GENERATION_CACHE_TTL_HOURS)
+    })
+    excess = await db.generation_cache.estimated_document_count() - GENERATION_CACHE_MAX_ENTRIES
+    if excess > 0:
+        stale = await db.generation_cache.find({}, {"_id": 1}).sort("last_used_at", 1).limit(excess).to_list(length=excess)
+        await db.generation_cache.delete_many({"_id": {"$in": [doc["_id"] for doc in stale]}})
+
+async def call_provider_once(subject: str, prompt: str, request_count: int, in_flight: Optional[asyncio.Event] = None) -> ProviderResponse:
+    """One rate-limited provider call with timeout; records its latency (excluding limiter wait) on success
+
+    Raises CircuitOpenError without calling the provider while gemini_breaker is open.
+    """
+    loop = asyncio.get_running_loop()
+    with await gemini_breaker.admit():
+        # The limiter budgets requests/tokens and adapts concurrency process-wide
+        async with await gemini_limiter.acquire(request_count * GEMINI_TOKENS_PER_QUESTION) as permit:
+            if in_flight:
+                in_flight.set()
+            started = loop.time()
+            response = await gemini_executor.run(question_provider.generate, prompt, timeout=GEMINI_CALL_TIMEOUT)
+            permit.record_tokens(response.output_tokens)
+    latency_tracker.record(subject, loop.time() - started)
+    return response
+
+def is_usable_response(task: asyncio.Future) -> bool:
+    return not task.cancelled() and task.exception() is None and bool(salvage_questions(task.result().text)[0])
+
+async def call_provider(subject: str, prompt: str, request_count: int) -> ProviderResponse:
+    """Call the provider, hedging with a duplicate request if the call runs past the subject's p90"""
+    hedge_budget.earn()
+    in_flight = asyncio.Event()
+    primary = asyncio.ensure_future(call_provider_once(subject, prompt, request_count, in_flight))
+    hedge_after = latency_tracker.percentile(subject, 90) if GEMINI_HEDGING_ENABLED else None
+    if hedge_after is None:
+        return await primary
+    
+    # Start the hedge clock once the primary is actually calling the provider, not while it queues
+    waiter = asyncio.ensure_future(in_flight.wait())
+    await asyncio.wait({primary, waiter}, return_when=asyncio.FIRST_COMPLETED)
+    waiter.cancel()
+    done, _ = await asyncio.wait({primary}, timeout=hedge_after)
+    if done or not hedge_budget.try_spend():
+        return await primary
+    
+    logger.info(f"Hedging {subject} chunk after {hedge_after:.1f}s")
+    hedge = asyncio.ensure_future(call_provider_once(subject, prompt, request_count))
+    pending = {primary, hedge}
+    try:
+        # Take the first usable response; if neither is usable, surface the primary's outcome
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if is_usable_response(task):
+                    if task is hedge:
+                        hedge_budget.hedge_wins += 1
+                    return task.result()
+        hedge.exception()  # Mark retrieved so a failed hedge isn't logged as unhandled
+        return await primary
+    finally:
+        for task in pending:
+            task.cancel()
 
 # AI Question Generation with Chunked Approach
-async def generate_questions_chunk(subject: str, count: int, exam_config: ExamConfig, chunk_size: int = 5) -> List[Question]:
-    """Generate questions in chunks to avoid timeout and size issues"""
-    all_questions = []
+def build_question_prompt(subject: str, chunk_count: int, exam_config: ExamConfig) -> str:
+    """Render the generation prompt for one chunk of questions"""
+    return f"""
+    You are an expert question writer for {exam_config.exam_type} competitive exams. Generate exactly {chunk_count} high-quality, original MCQ questions for {subject} at {exam_config.difficulty} difficulty level.
+
+    CRITICAL REQUIREMENTS:
+    - Generate REAL, SPECIFIC, DETAILED questions (NOT sample/template questions)
+    - NO generic phrases like "Sample question", "Question 1", "Option A for question 1"
+    - Each question must be a complete, standalone academic question
+    - Questions should test actual {subject} concepts relevant to {exam_config.exam_type}
+    - Include specific numerical values, formulas, concepts, or scenarios where appropriate
+    - Each question must have exactly 4 distinct, meaningful options
+    - Only one correct answer per question
+    - Include detailed solution with step-by-step explanation
+    - Cover different topics within {subject}
+    - Maintain {exam_config.difficulty} difficulty level throughout
+
+    QUESTION QUALITY STANDARDS:
+    - Questions should be exam-level quality, not basic or template-like
+    - Options should be plausible and test understanding
+    - Avoid obvious wrong answers
+    - Include relevant diagrams descriptions if needed
+    - Solutions should be educational and complete
+
+    FORBIDDEN CONTENT:
+    - NO "Sample [subject] question" phrasing
+    - NO "Option A for question X" format
+    - NO placeholder or template text
+    - NO generic question stems
+
+    Example of GOOD question format:
+    "A uniform rod of length 2m and mass 5kg is pivoted at its center. If a force of 10N is applied at one end perpendicular to the rod, what is the angular acceleration?"
+
+    Example of BAD question format (NEVER use):
+    "Sample Physics question 1 for NEET"
+
+    Generate exactly {chunk_count} questions following these standards.
+
+    Output ONLY valid JSON in this EXACT format (no extra text):
+    {{
+        "questions": [
+            {{
+                "question": "Complete specific question text with actual content",
+                "options": ["Specific option 1", "Specific option 2", "Specific option 3", "Specific option 4"],
+                "correct_index": 0,
+                "correct_answer": "A",
+                "solution": "Detailed step-by-step solution explanation",
+                "difficulty": "{exam_config.difficulty}",
+                "subject": "{subject}",
+                "topic": "Specific topic name",
+                "exam_type": "{exam_config.exam_type}"
+            }}
+        ]
+    }}
+    """
+
+async def generate_single_chunk(subject: str, chunk_count: int, exam_config: ExamConfig, chunk_number: int, seen: Optional[NearDuplicateIndex] = None, user_id: Optional[str] = None, progress: Optional[GenerationProgress] = None) -> List[Question]:
+    """Generate and validate one chunk of questions, retrying on failure
+
+    Over-requests by the observed rejection rate; surplus valid questions go to the question bank.
+    Identical requests are served from the generation cache unless exam_config bypasses or refreshes it.
+    """
+    cache_key = generation_cache_key(subject, chunk_count, exam_config)
+    # Sibling chunks with the same key start together, so a refresh keeps their new entries
+    refresh_before = datetime.utcnow() if exam_config.generation_cache == "refresh" else None
+    if exam_config.generation_cache == "use":
+        cached = [question for question in await generation_cache_lookup(cache_key, user_id) if register_if_unique(question, seen)]
+        if cached:
+            logger.info(f"Served {len(cached)} {subject} questions for chunk {chunk_number} from the generation cache")
+            return cached
     
-    # Split into smaller chunks
+    max_retries = 3
+    for attempt in range(max_retries):
+        if progress:
+            await progress.chunk_attempt(subject)
+        request_count = acceptance_tracker.request_size(subject, exam_config.difficulty, chunk_count)
+        prompt = build_question_prompt(subject, request_count, exam_config)
+        try:
+            # Generate with timeout, hedging stragglers when enabled
+            response = await call_provider(subject, prompt, request_count)
+            
+            if not response.text:
+                logger.error(f"Empty response from {question_provider.name} provider")
+                continue
+            
+            response_text = response.text.strip()
+            logger.info(f"Raw response length: {len(response_text)}")
+            
+            # Parse every complete question, salvaging what we can from truncated or noisy output
+            chunk_questions, complete = salvage_questions(response_text)
+            if not complete:
+                logger.warning(f"Truncated or malformed response for {subject} chunk {chunk_number}; salvaged {len(chunk_questions)} complete questions")
+                logger.warning(f"Response tail: ...{response_text[-300:]}")
+            
+            if not chunk_questions:
+                logger.error("No questions found in parsed response")
+                continue
+            
+            # Validate we got the expected number of questions
+            if len(chunk_questions) != request_count:
+                logger.warning(f"Expected {request_count} questions, got {len(chunk_questions)} for {subject} chunk {chunk_number}")
+            
+            # Convert to Question objects with enhanced validation
+            valid_questions = []
+            for q_data in chunk_questions:
+                try:
+                    rejections = validate_question(q_data)
+                    if rejections:
+                        logger.warning(f"Question rejected: {rejections[0]}")
+                        continue
+                    
+                    # If we reach here, the question passed all validation
+                    question_text = q_data["question"].strip()
+                    question = Question(
+                        question=question_text,
+                        options=q_data["options"],
+                        correct_index=int(q_data["correct_index"]),
+                        correct_answer=q_data["correct_answer"],
+                        solution=q_data["solution"].strip(),
+                        difficulty=q_data["difficulty"],
+                        subject=q_data["subject"],
+                        topic=q_data.get("topic", "General"),
+                        exam_type=q_data["exam_type"]
+                    )
+                    if not register_if_unique(question, seen):
+                        continue
+                    valid_questions.append(question)
+                    logger.info(f"Accepted valid question: {question_text[:100]}...")
+                    
+                except Exception as e:
+                    logger.error(f"Error parsing question: {str(e)}")
+                    continue
+            
+            logger.info(f"Generated {len(valid_questions)} valid questions out of {len(chunk_questions)} total in chunk {chunk_number}")
+            acceptance_tracker.record(subject, exam_config.difficulty, request_count, len(valid_questions))
+            
+            # If we didn't get any valid questions from this chunk, fail the attempt
+            if not valid_questions:
+                logger.error(f"No valid questions generated in chunk {chunk_number}, attempt {attempt+1}")
+                if attempt == max_retries - 1:
+                    raise Exception(f"Failed to generate valid questions for {subject} after {max_retries} attempts")
+                continue
+            
+            logger.info(f"Successfully generated {len(valid_questions)} valid questions for {subject} chunk {chunk_number}")
+            surplus = valid_questions[chunk_count:]
+            if surplus and QUESTION_BANK_ENABLED:
+                await add_to_question_bank(surplus)
+            if exam_config.generation_cache != "bypass":
+                await generation_cache_store(cache_key, valid_questions[:chunk_count], user_id, replace_before=refresh_before)
+            return valid_questions[:chunk_count]
+            
+        except CircuitOpenError:
+            # The provider is known to be down; retrying would only fail again
+            logger.warning(f"Skipping {subject} chunk {chunk_number}: {question_provider.name} circuit is open")
+            raise
+        except asyncio.TimeoutError:
+            logger.warning(f"Timeout generating {subject} chunk {chunk_number}, attempt {attempt+1}")
+            if attempt == max_retries - 1:
+                raise Exception(f"Failed to generate questions for {subject} due to timeout after {max_retries} attempts. Please try again later or check API quota.")
+        except ProviderQuotaError as e:
+            logger.error(f"API quota exceeded or rate limited generating {subject} chunk {chunk_number}, attempt {attempt+1}: {str(e)}")
+            if attempt == max_retries - 1:
+                raise Exception(f"API quota exceeded - failed to generate questions for {subject} after {max_retries} attempts. Please try again later.")
+        except Exception as e:
+            logger.error(f"Error generating {subject} chunk {chunk_number}, attempt {attempt+1}: {str(e)}")
+            if attempt == max_retries - 1:
+                raise Exception(f"Failed to generate questions for {subject} after {max_retries} attempts: {str(e)}")
+    
+    return []
+
+def split_into_chunks(count: int, chunk_size: int) -> List[int]:
     chunks = []
     remaining = count
     while remaining > 0:
         current_chunk = min(chunk_size, remaining)
         chunks.append(current_chunk)
         remaining -= current_chunk
+    return chunks
+
+async def generate_questions_chunk(subject: str, count: int, exam_config: ExamConfig, chunk_size: int = 5, progress: Optional[GenerationProgress] = None, seen: Optional[NearDuplicateIndex] = None, user_id: Optional[str] = None) -> List[Question]:
+    """Generate questions in chunks to avoid timeout and size issues"""
+    async def run_chunk(chunk_number: int, chunk_count: int) -> List[Question]:
+        try:
+            questions = await generate_single_chunk(subject, chunk_count, exam_config, chunk_number, seen, user_id, progress)
+        except Exception as e:
+            if progress:
+                await progress.chunk_failed(subject, chunk_number, str(e))
+            raise
+        if progress:
+            await progress.chunk_completed(subject, questions)
+        return questions
     
-    logger.info(f"Generating {count} questions for {subject} in {len(chunks)} chunks: {chunks}")
+    all_questions = []
+    errors = []
+    chunk_offset = 0
     
-    for i, chunk_count in enumerate(chunks):
-        max_retries = 3
-        for attempt in range(max_retries):
-            try:
-                prompt = f"""
-                You are an expert question writer for {exam_config.exam_type} competitive exams. Generate exactly {chunk_count} high-quality, original MCQ questions for {subject} at {exam_config.difficulty} difficulty level.
-
-                CRITICAL REQUIREMENTS:
-                - Generate REAL, SPECIFIC, DETAILED questions (NOT sample/template questions)
-                - NO generic phrases like "Sample question", "Question 1", "Option A for question 1"
-                - Each question must be a complete, standalone academic question
-                - Questions should test actual {subject} concepts relevant to {exam_config.exam_type}
-                - Include specific numerical values, formulas, concepts, or scenarios where appropriate
-                - Each question must have exactly 4 distinct, meaningful options
-                - Only one correct answer per question
-                - Include detailed solution with step-by-step explanation
-                - Cover different topics within {subject}
-                - Maintain {exam_config.difficulty} difficulty level throughout
-
-                QUESTION QUALITY STANDARDS:
-                - Questions should be exam-level quality, not basic or template-like
-                - Options should be plausible and test understanding
-                - Avoid obvious wrong answers
-                - Include relevant diagrams descriptions if needed
-                - Solutions should be educational and complete
-
-                FORBIDDEN CONTENT:
-                - NO "Sample [subject] question" phrasing
-                - NO "Option A for question X" format
-                - NO placeholder or template text
-                - NO generic question stems
-
-                Example of GOOD question format:
-                "A uniform rod of length 2m and mass 5kg is pivoted at its center. If a force of 10N is applied at one end perpendicular to the rod, what is the angular acceleration?"
-
-                Example of BAD question format (NEVER use):
-                "Sample Physics question 1 for NEET"
-
-                Generate exactly {chunk_count} questions following these standards.
-
-                Output ONLY valid JSON in this EXACT format (no extra text):
-                {{
-                    "questions": [
-                        {{
-                            "question": "Complete specific question text with actual content",
-                            "options": ["Specific option 1", "Specific option 2", "Specific option 3", "Specific option 4"],
-                            "correct_index": 0,
-                            "correct_answer": "A",
-                            "solution": "Detailed step-by-step solution explanation",
-                            "difficulty": "{exam_config.difficulty}",
-                            "subject": "{subject}",
-                            "topic": "Specific topic name",
-                            "exam_type": "{exam_config.exam_type}"
-                        }}
-                    ]
-                }}
-                """
-                
-                # Generate with timeout
-                response = await asyncio.wait_for(
-                    asyncio.get_event_loop().run_in_executor(
-                        None, lambda: model.generate_content(
-                            prompt,
-                            generation_config=genai.types.GenerationConfig(
-                                temperature=0.5,  # Reduced temperature for more consistent, quality responses
-                                max_output_tokens=8192,
-                            )
-                        )
-                    ),
-                    timeout=90.0  # Increased timeout for better quality generation
-                )
-                
-                if not response or not response.text:
-                    logger.error("Empty response from Gemini API")
-                    continue
-                
-                response_text = response.text.strip()
-                logger.info(f"Raw response length: {len(response_text)}")
-                
-                # Check for API quota exceeded or other errors in response
-                if "quota" in response_text.lower() or "limit" in response_text.lower() or "exceeded" in response_text.lower():
-                    logger.error("API quota exceeded or rate limited")
-                    raise Exception("API quota exceeded - cannot generate quality questions")
-                
-                # Clean JSON response - be more aggressive in cleaning
-                if "```json" in response_text:
-                    start = response_text.find("```json") + 7
-                    end = response_text.rfind("```")
-                    if end > start:
-                        response_text = response_text[start:end].strip()
-                elif "```" in response_text:
-                    start = response_text.find("```") + 3
-                    end = response_text.rfind("```")
-                    if end > start:
-                        response_text = response_text[start:end].strip()
-                
-                # Find JSON content if there's extra text
-                json_start = response_text.find("{")
-                json_end = response_text.rfind("}") + 1
-                if json_start >= 0 and json_end > json_start:
-                    response_text = response_text[json_start:json_end]
-                
-                # Parse JSON
-                try:
-                    parsed_response = json.loads(response_text)
-                except json.JSONDecodeError as e:
-                    logger.error(f"Failed to parse JSON response: {str(e)}")
-                    logger.error(f"Response text: {response_text[:500]}...")
-                    continue
-                
-                chunk_questions = parsed_response.get("questions", [])
-                
-                if not chunk_questions:
-                    logger.error("No questions found in parsed response")
-                    continue
-                
-                # Validate we got the expected number of questions
-                if len(chunk_questions) != chunk_count:
-                    logger.warning(f"Expected {chunk_count} questions, got {len(chunk_questions)} for {subject} chunk {i+1}")
-                
-                # Convert to Question objects with enhanced validation
-                valid_questions_in_chunk = 0
-                for q_data in chunk_questions:
-                    try:
-                        question_text = q_data.get("question", "").strip()
-                        options = q_data.get("options", [])
-                        solution = q_data.get("solution", "").strip()
-                        
-                        # Enhanced validation - reject sample/template questions
-                        forbidden_phrases = [
-                            "sample", "Sample", "SAMPLE",
-                            "question 1", "Question 1", "QUESTION 1", 
-                            "question 2", "Question 2", "QUESTION 2",
-                            "option a for", "Option A for", "OPTION A FOR",
-                            "option b for", "Option B for", "OPTION B FOR", 
-                            "option c for", "Option C for", "OPTION C FOR",
-                            "option d for", "Option D for", "OPTION D FOR",
-                            "placeholder", "Placeholder", "PLACEHOLDER",
-                            "example question", "Example Question", "EXAMPLE QUESTION",
-                            "template", "Template", "TEMPLATE",
-                            "sample physics", "Sample Physics", "SAMPLE PHYSICS",
-                            "sample chemistry", "Sample Chemistry", "SAMPLE CHEMISTRY",
-                            "sample mathematics", "Sample Mathematics", "SAMPLE MATHEMATICS",
-                            "sample biology", "Sample Biology", "SAMPLE BIOLOGY",
-                            "for neet", "For NEET", "FOR NEET",
-                            "for jee", "For JEE", "FOR JEE",
-                            "for eamcet", "For EAMCET", "FOR EAMCET"
-                        ]
-                        
-                        is_valid_question = True
-                        rejection_reason = ""
-                        
-                        # Check for forbidden phrases in question
-                        for phrase in forbidden_phrases:
-                            if phrase.lower() in question_text.lower():
-                                logger.warning(f"Rejected question with forbidden phrase '{phrase}': {question_text[:100]}...")
-                                is_valid_question = False
-                                rejection_reason = f"Contains forbidden phrase: {phrase}"
-                                break
-                        
-                        # Check for forbidden phrases in options
-                        if is_valid_question:
-                            for i, option in enumerate(options):
-                                option_text = str(option).strip()
-                                for phrase in forbidden_phrases:
-                                    if phrase.lower() in option_text.lower():
-                                        logger.warning(f"Rejected question with forbidden phrase in option {i+1}: {option_text}")
-                                        is_valid_question = False
-                                        rejection_reason = f"Option contains forbidden phrase: {phrase}"
-                                        break
-                                if not is_valid_question:
-                                    break
-                        
-                        # Additional validation: check if question is too generic
-                        if is_valid_question and len(question_text.split()) < 10:  # Increased minimum words
-                            logger.warning(f"Rejected too short question: {question_text}")
-                            is_valid_question = False
-                            rejection_reason = "Question too short/generic"
-                        
-                        # Check if options are meaningful
-                        if is_valid_question and len(options) != 4:
-                            is_valid_question = False
-                            rejection_reason = "Invalid number of options"
-                        
-                        # Check for generic option patterns
-                        if is_valid_question:
-                            for i, option in enumerate(options):
-                                option_text = str(option).strip()
-                                if f"Option {chr(65+i)}" in option_text or f"option {chr(97+i)}" in option_text:
-                                    is_valid_question = False
-                                    rejection_reason = f"Generic option pattern detected: {option_text}"
-                                    break
-                                if len(option_text.split()) < 2:  # Options should have meaningful content
-                                    is_valid_question = False
-                                    rejection_reason = f"Option too short: {option_text}"
-                                    break
-                        
-                        # Check solution quality
-                        if is_valid_question and len(solution.split()) < 5:
-                            is_valid_question = False
-                            rejection_reason = "Solution too short/generic"
-                        
-                        if not is_valid_question:
-                            logger.warning(f"Question rejected: {rejection_reason}")
-                            continue
-                            
-                        # If we reach here, the question passed all validation
-                        question = Question(
-                            question=question_text,
-                            options=options,
-                            correct_index=int(q_data["correct_index"]),
-                            correct_answer=q_data["correct_answer"],
-                            solution=solution,
-                            difficulty=q_data["difficulty"],
-                            subject=q_data["subject"],
-                            topic=q_data.get("topic", "General"),
-                            exam_type=q_data["exam_type"]
-                        )
-                        all_questions.append(question)
-                        valid_questions_in_chunk += 1
-                        logger.info(f"Accepted valid question: {question_text[:100]}...")
-                        
-                    except Exception as e:
-                        logger.error(f"Error parsing question: {str(e)}")
-                        continue
-                
-                logger.info(f"Generated {valid_questions_in_chunk} valid questions out of {len(chunk_questions)} total in chunk {i+1}")
-                
-                # If we didn't get any valid questions from this chunk, fail the attempt
-                if valid_questions_in_chunk == 0:
-                    logger.error(f"No valid questions generated in chunk {i+1}, attempt {attempt+1}")
-                    if attempt == max_retries - 1:
-                        raise Exception(f"Failed to generate valid questions for {subject} after {max_retries} attempts")
-                    continue
-                
-                logger.info(f"Successfully generated {valid_questions_in_chunk} valid questions for {subject} chunk {i+1}")
-                break  # Success, break retry loop
-                
-            except asyncio.TimeoutError:
-                logger.warning(f"Timeout generating {subject} chunk {i+1}, attempt {attempt+1}")
-                if attempt == max_retries - 1:
-                    raise Exception(f"Failed to generate questions for {subject} due to timeout after {max_retries} attempts. Please try again later or check API quota.")
-            except Exception as e:
-                logger.error(f"Error generating {subject} chunk {i+1}, attempt {attempt+1}: {str(e)}")
-                if attempt == max_retries - 1:
-                    raise Exception(f"Failed to generate questions for {subject} after {max_retries} attempts: {str(e)}")
+    # First round covers the full count; later rounds top up only what is still missing
+    for round_number in range(1 + MAX_TOPUP_ROUNDS):
+        missing = count - len(all_questions)
+        if missing <= 0:
+            break
         
-        # Small delay between chunks to avoid rate limiting
-        if i < len(chunks) - 1:
-            await asyncio.sleep(2)
+        chunks = split_into_chunks(missing, chunk_size)
+        if round_number == 0:
+            logger.info(f"Generating {count} questions for {subject} in {len(chunks)} chunks: {chunks}")
+        else:
+            logger.info(f"Topping up {missing} missing {subject} questions in {len(chunks)} chunks (round {round_number})")
+        if progress:
+            await progress.chunks_planned(subject, len(chunks))
+        
+        # Run all chunks concurrently; pacing and the in-flight cap come from gemini_limiter
+        chunk_results = await asyncio.gather(
+            *(run_chunk(chunk_offset + i + 1, chunk_count) for i, chunk_count in enumerate(chunks)),
+            return_exceptions=True
+        )
+        
+        for i, result in enumerate(chunk_results):
+            if isinstance(result, BaseException):
+                logger.error(f"Chunk {chunk_offset + i + 1} for {subject} failed: {str(result)}")
+                errors.append(result)
+            else:
+                all_questions.extend(result)
+        chunk_offset += len(chunks)
+        
+        # Stop topping up once a whole round fails or the circuit opens; the upstream is unlikely to recover immediately
+        if all(isinstance(result, BaseException) for result in chunk_results) or gemini_breaker.is_open():
+            break
+    
+    # Only fail the subject if every chunk failed
+    if not all_questions and errors:
+        raise errors[0]
     
     logger.info(f"Generated total {len(all_questions)} questions for {subject}")
     return all_questions
 
-async def generate_questions_with_gemini(exam_config: ExamConfig) -> List[Question]:
-    """Generate questions using Gemini AI with chunked approach and robust error handling"""
-    
-    # Subject distribution based on exam type
-    subject_distribution = {
-        "JEE Main": {"Physics": 25, "Chemistry": 25, "Mathematics": 25},
-        "NEET": {"Physics": 45, "Chemistry": 45, "Biology": 90},
-        "EAMCET Engineering": {"Physics": 40, "Chemistry": 40, "Mathematics": 80},
-        "EAMCET Medical": {"Physics": 40, "Chemistry": 40, "Biology": 80}
-    }
-    
-    # Calculate questions per subject
+# Subject distribution based on exam type
+SUBJECT_DISTRIBUTION = {
+    "JEE Main": {"Physics": 25, "Chemistry": 25, "Mathematics": 25},
+    "NEET": {"Physics": 45, "Chemistry": 45, "Biology": 90},
+    "EAMCET Engineering": {"Physics": 40, "Chemistry": 40, "Mathematics": 80},
+    "EAMCET Medical": {"Physics": 40, "Chemistry": 40, "Biology": 80}
+}
+
+def calculate_questions_per_subject(exam_config: ExamConfig) -> Dict[str, int]:
+    """Split the requested question count across the exam's subjects"""
     total_questions = exam_config.question_count
-    if exam_config.exam_type in subject_distribution:
-        total_standard = sum(subject_distribution[exam_config.exam_type].values())
+    if exam_config.exam_type in SUBJECT_DISTRIBUTION:
+        total_standard = sum(SUBJECT_DISTRIBUTION[exam_config.exam_type].values())
         ratio = total_questions / total_standard
         questions_per_subject = {
             subject: max(1, int(count * ratio))
-            for subject, count in subject_distribution[exam_config.exam_type].items()
+            for subject, count in SUBJECT_DISTRIBUTION[exam_config.exam_type].items()
             if subject in exam_config.subjects
         }
     else:
@@ -580,25 +1115,255 @@ async def generate_questions_with_gemini(exam_config: ExamConfig) -> List[Questi
         questions_per_subject[last_subject] -= (current_total - total_questions)
         questions_per_subject[last_subject] = max(1, questions_per_subject[last_subject])
     
-    logger.info(f"Question distribution: {questions_per_subject}")
+    return questions_per_subject
+
+# Pre-generated question bank
+QUESTION_BANK_ENABLED = os.environ.get('QUESTION_BANK_ENABLED', 'true').lower() == 'true'
+QUESTION_BANK_LOW_WATER = int(os.environ.get('QUESTION_BANK_LOW_WATER', '20'))
+QUESTION_BANK_TARGET = int(os.environ.get('QUESTION_BANK_TARGET', '40'))
+QUESTION_BANK_REFILL_INTERVAL = float(os.environ.get('QUESTION_BANK_REFILL_INTERVAL', '300'))  # seconds
+QUESTION_BANK_DIFFICULTIES = ["Easy", "Medium", "Hard"]  # Mixed exams draw from all three
+QUESTION_BANK_DEMAND_WINDOW = float(os.environ.get('QUESTION_BANK_DEMAND_WINDOW_HOURS', '168'))  # hours
+QUESTION_BANK_LEASE_TTL = float(os.environ.get('QUESTION_BANK_LEASE_TTL', '600'))  # seconds
+# Refill runs on its own small budget, within gemini_limiter, so it never crowds out user exams
+QUESTION_BANK_REFILL_CHUNK = int(os.environ.get('QUESTION_BANK_REFILL_CHUNK', '5'))
+QUESTION_BANK_REFILL_CHUNKS_PER_MINUTE = float(os.environ.get('QUESTION_BANK_REFILL_CHUNKS_PER_MINUTE', '4'))
+QUESTION_BANK_REFILL_YIELD_INTERVAL = float(os.environ.get('QUESTION_BANK_REFILL_YIELD_INTERVAL', '5'))  # seconds
+
+refill_limiter = AdaptiveRateLimiter(
+    requests_per_minute=QUESTION_BANK_REFILL_CHUNKS_PER_MINUTE,
+    tokens_per_minute=QUESTION_BANK_REFILL_CHUNKS_PER_MINUTE * QUESTION_BANK_REFILL_CHUNK * GEMINI_TOKENS_PER_QUESTION,
+    max_concurrency=1
+)
+
+# Identifies this process as the holder of leases shared by every worker
+PROCESS_ID = str(uuid.uuid4())
+
+question_bank_task: Optional[asyncio.Task] = None
+
+async def draw_from_question_bank(exam_type: str, subject: str, difficulty: Optional[str], count: int) -> List[Question]:
+    """Claim up to `count` stored questions for a bucket and remove them from the bank
+
+    A `difficulty` of None draws from every difficulty of the exam type and subject.
+    """
+    if count <= 0 or not QUESTION_BANK_ENABLED:
+        return []
     
-    all_questions = []
+    bucket = {"exam_type": exam_type, "subject": subject}
+    if difficulty is not None:
+        bucket["difficulty"] = difficulty
+    sampled = await db.question_bank.aggregate([
+        {"$match": {**bucket, "claimed_by": None}},
+        {"$sample": {"size": count}},
+        {"$project": {"_id": 0, "id": 1}}
+    ]).to_list(length=count)
+    if not sampled:
+        return []
     
-    # Generate questions for each subject concurrently but with controlled concurrency
-    tasks = []
-    for subject, count in questions_per_subject.items():
-        task = generate_questions_chunk(subject, count, exam_config)
-        tasks.append(task)
+    # Claim before reading so concurrent exams never receive the same question
+    claim_id = str(uuid.uuid4())
+    await db.question_bank.update_many(
+        {"id": {"$in": [doc["id"] for doc in sampled]}, "claimed_by": None},
+        {"$set": {"claimed_by": claim_id}}
+    )
+    claimed = await db.question_bank.find({"claimed_by": claim_id}, {"_id": 0}).to_list(length=count)
+    await db.question_bank.delete_many({"claimed_by": claim_id})
+    for doc in claimed:
+        question_bank_index.remove(doc["id"])
     
-    # Execute tasks with some concurrency but not all at once to avoid rate limits
-    for task in tasks:
+    return [Question(**doc) for doc in claimed]
+
+async def add_to_question_bank(questions: List[Question]):
+    """Store validated questions in the bank"""
+    if not questions:
+        return
+    banked_at = datetime.utcnow()
+    await db.question_bank.insert_many([
+        {**question.dict(), "claimed_by": None, "banked_at": banked_at}
+        for question in questions
+    ])
+    for question in questions:
+        question_bank_index.add(question.id, dedup_text(question))
+
+async def load_question_bank_index():
+    """Index every stored bank question for near-duplicate checks"""
+    cursor = db.question_bank.find({"claimed_by": None}, {"_id": 0, "id": 1, "question": 1, "options": 1})
+    async for doc in cursor:
+        question_bank_index.add(doc["id"], doc["question"] + " " + " ".join(doc["options"]))
+    logger.info(f"Indexed {len(question_bank_index)} question bank entries for duplicate detection")
+
+async def record_question_bank_demand(exam_type: str, subject: str, difficulty: str):
+    """Mark the buckets an exam draws from so the refill worker keeps them stocked"""
+    if not QUESTION_BANK_ENABLED:
+        return
+    difficulties = QUESTION_BANK_DIFFICULTIES if difficulty == "Mixed" else [difficulty]
+    now = datetime.utcnow()
+    await db.question_bank_demand.bulk_write([
+        UpdateOne(
+            {"_id": f"{exam_type}|{subject}|{bucket_difficulty}"},
+            {"$set": {"exam_type": exam_type, "subject": subject, "difficulty": bucket_difficulty, "last_drawn_at": now}},
+            upsert=True
+        )
+        for bucket_difficulty in difficulties
+    ], ordered=False)
+
+async def acquire_lease(name: str, ttl: float) -> bool:
+    """Take or renew a named lease shared by every worker process; False if another process holds it"""
+    now = datetime.utcnow()
+    try:
+        await db.leases.update_one(
+            {"_id": name, "$or": [{"owner": PROCESS_ID}, {"expires_at": {"$lte": now}}]},
+            {"$set": {"owner": PROCESS_ID, "expires_at": now + timedelta(seconds=ttl)}},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        # The lease exists, is unexpired and belongs to someone else
+        return False
+    return True
+
+async def release_lease(name: str):
+    await db.leases.delete_one({"_id": name, "owner": PROCESS_ID})
+
+async def yield_to_user_generation():
+    """Wait while this process is generating exams for users"""
+    while generation_tasks:
+        await asyncio.sleep(QUESTION_BANK_REFILL_YIELD_INTERVAL)
+
+async def refill_question_bank_bucket(exam_type: str, subject: str, difficulty: str, shortfall: int):
+    """Generate a bucket's shortfall in small chunks paced by refill_limiter"""
+    bucket_config = ExamConfig(
+        exam_type=exam_type,
+        subjects=[subject],
+        question_count=shortfall,
+        duration=0,
+        difficulty=difficulty,
+        generation_cache="bypass"
+    )
+    seen = NearDuplicateIndex()
+    for chunk_count in split_into_chunks(shortfall, QUESTION_BANK_REFILL_CHUNK):
+        await yield_to_user_generation()
+        async with await refill_limiter.acquire(chunk_count * GEMINI_TOKENS_PER_QUESTION):
+            questions = await generate_questions_chunk(subject, chunk_count, bucket_config, seen=seen)
+        await add_to_question_bank(questions)
+
+async def replenish_question_bank():
+    """Top up recently drawn buckets that have fallen below the low-water mark
+
+    Only the process holding the refill lease does any work, so running several
+    workers does not multiply the provider calls.
+    """
+    if gemini_breaker.is_open():
+        logger.info(f"Skipping question bank replenishment; {question_provider.name} circuit is open")
+        return
+    if not await acquire_lease("question_bank_refill", QUESTION_BANK_LEASE_TTL):
+        logger.info("Skipping question bank replenishment; another process holds the refill lease")
+        return
+    
+    try:
+        since = datetime.utcnow() - timedelta(hours=QUESTION_BANK_DEMAND_WINDOW)
+        buckets = await db.question_bank_demand.find({"last_drawn_at": {"$gte": since}}, {"_id": 0}).to_list(length=None)
+        for bucket in buckets:
+            exam_type, subject, difficulty = bucket["exam_type"], bucket["subject"], bucket["difficulty"]
+            if subject not in SUBJECT_DISTRIBUTION.get(exam_type, {}) or difficulty not in QUESTION_BANK_DIFFICULTIES:
+                continue
+            stock = await db.question_bank.count_documents(
+                {"exam_type": exam_type, "subject": subject, "difficulty": difficulty, "claimed_by": None}
+            )
+            if stock >= QUESTION_BANK_LOW_WATER:
+                continue
+            
+            # Renew before each bucket; a refill outliving the lease must not overlap another process's
+            if not await acquire_lease("question_bank_refill", QUESTION_BANK_LEASE_TTL):
+                logger.warning("Stopping question bank replenishment; the refill lease was lost")
+                return
+            shortfall = QUESTION_BANK_TARGET - stock
+            logger.info(f"Replenishing question bank for {exam_type}/{subject}/{difficulty}: {stock} in stock, generating {shortfall}")
+            try:
+                await refill_question_bank_bucket(exam_type, subject, difficulty, shortfall)
+            except CircuitOpenError:
+                logger.info("Stopping question bank replenishment; the provider circuit opened")
+                return
+            except Exception as e:
+                logger.error(f"Failed to replenish question bank for {exam_type}/{subject}/{difficulty}: {str(e)}")
+    finally:
+        await release_lease("question_bank_refill")
+
+async def question_bank_worker():
+    """Background loop keeping the question bank stocked"""
+    while True:
+        try:
+            await replenish_question_bank()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Question bank worker error: {str(e)}")
+        await asyncio.sleep(QUESTION_BANK_REFILL_INTERVAL)
+
+async def collect_subject_questions(subject: str, count: int, exam_config: ExamConfig, progress: Optional[GenerationProgress] = None, seen: Optional[NearDuplicateIndex] = None, user_id: Optional[str] = None) -> List[Question]:
+    """Take questions from the bank first and generate only the shortfall live
+
+    While the provider circuit is open, or once generation has failed and opened it,
+    the shortfall is drawn from the bank's other difficulties for the subject instead.
+    The generation error is only raised if that leaves no questions at all.
+    """
+    async def draw(difficulty: Optional[str], wanted: int) -> List[Question]:
+        drawn = await draw_from_question_bank(exam_config.exam_type, subject, difficulty, wanted)
+        if seen is not None:
+            for question in drawn:
+                seen.add(question.id, dedup_text(question))
+        if drawn:
+            logger.info(f"Drew {len(drawn)} of {wanted} {subject} questions from the question bank ({difficulty or 'any difficulty'})")
+            if progress:
+                await progress.bank_drawn(subject, list(drawn))
+        return drawn
+    
+    await record_question_bank_demand(exam_config.exam_type, subject, exam_config.difficulty)
+    questions = await draw(None if exam_config.difficulty == "Mixed" else exam_config.difficulty, count)
+    
+    generation_error = None
+    shortfall = count - len(questions)
+    if shortfall > 0 and not gemini_breaker.is_open():
         try:
-            subject_questions = await task
-            all_questions.extend(subject_questions)
+            questions.extend(await generate_questions_chunk(subject, shortfall, exam_config, progress=progress, seen=seen, user_id=user_id))
         except Exception as e:
-            logger.error(f"Failed to generate questions for a subject: {str(e)}")
+            # Usually a quota or timeout error from the chunk that tripped the breaker
+            generation_error = e
+    
+    shortfall = count - len(questions)
+    if shortfall > 0 and gemini_breaker.is_open():
+        logger.warning(f"{question_provider.name} circuit is open; falling back to banked {subject} questions of any difficulty")
+        questions.extend(await draw(None, shortfall))
+    
+    if not questions and generation_error:
+        raise generation_error
+    return questions
+
+async def generate_questions_with_gemini(exam_config: ExamConfig, progress: Optional[GenerationProgress] = None, user_id: Optional[str] = None) -> List[Question]:
+    """Generate questions using Gemini AI with chunked approach and robust error handling"""
+    total_questions = exam_config.question_count
+    questions_per_subject = calculate_questions_per_subject(exam_config)
+    
+    logger.info(f"Question distribution: {questions_per_subject}")
+    
+    all_questions = []
+    seen = NearDuplicateIndex()  # Everything accepted into this exam so far
+    
+    # Collect all subjects concurrently; gemini_limiter bounds the in-flight API calls
+    subject_results = await asyncio.gather(
+        *(collect_subject_questions(subject, count, exam_config, progress, seen, user_id) for subject, count in questions_per_subject.items()),
+        return_exceptions=True
+    )
+    
+    for subject, result in zip(questions_per_subject, subject_results):
+        if isinstance(result, BaseException):
+            logger.error(f"Failed to generate questions for {subject}: {str(result)}")
+        else:
+            all_questions.extend(result)
     
     # Check if we have enough valid questions
+    if len(all_questions) < total_questions * 0.5 and gemini_breaker.is_open():
+        raise Exception(f"Question generation is temporarily unavailable and the question bank is short. Please try again in {max(1, round(gemini_breaker.retry_after))} seconds.")
+    
     if len(all_questions) == 0:
         raise Exception("Failed to generate any valid questions. API quota may be exceeded. Please try again later.")
     
@@ -612,6 +1377,84 @@ async def generate_questions_with_gemini(exam_config: ExamConfig) -> List[Questi
     logger.info(f"Total valid questions generated: {len(all_questions)} out of requested {total_questions}")
     return all_questions
 
+# Materialized per-user dashboard stats, maintained incrementally with $inc/$max
+# Exams that never received questions; they are left out of stats and the dashboard
+UNDELIVERED_EXAM_STATUSES = ["generating", "failed"]
+
+def empty_user_stats() -> dict:
+    return {
+        "total_exams": 0,
+        "completed_exams": 0,
+        "results_count": 0,
+        "percentage_sum": 0.0,
+        "best_percentage": 0.0,
+        "subjects": {}
+    }
+
+def stats_subject_key(subject: str) -> str:
+    """Subject name escaped for use as a field name; '.' and '$' would otherwise be read as path syntax"""
+    return subject.replace("%", "%25").replace(".", "%2E").replace("$", "%24")
+
+def stats_subject_name(key: str) -> str:
+    return key.replace("%24", "$").replace("%2E", ".").replace("%25", "%")
+
+async def init_user_stats(user_id: str):
+    """Start a new user's stats document at zero"""
+    await db.user_stats.update_one(
+        {"user_id": user_id},
+        {"$setOnInsert": {**empty_user_stats(), "complete": True, "updated_at": datetime.utcnow()}},
+        upsert=True
+    )
+
+async def record_exam_created(user_id: str):
+    await db.user_stats.update_one(
+        {"user_id": user_id},
+        {"$inc": {"total_exams": 1}, "$set": {"updated_at": datetime.utcnow()}},
+        upsert=True
+    )
+
+async def record_exam_result(result: ExamResult):
+    increments = {"completed_exams": 1, "results_count": 1, "percentage_sum": result.percentage}
+    for subject, score in result.subject_wise_score.items():
+        # Subject names come from generated questions, so they are escaped before going into field paths
+        key = stats_subject_key(subject)
+        increments[f"subjects.{key}.correct"] = score["correct"]
+        increments[f"subjects.{key}.total"] = score["total"]
+    await db.user_stats.update_one(
+        {"user_id": result.user_id},
+        {"$inc": increments, "$max": {"best_percentage": result.percentage}, "$set": {"updated_at": datetime.utcnow()}},
+        upsert=True
+    )
+
+async def rebuild_user_stats(user_id: str) -> dict:
+    """Recompute a user's stats from their exams and results (users who predate the stats document)"""
+    stats = empty_user_stats()
+    stats["total_exams"] = await db.exams.count_documents({"user_id": user_id, "status": {"$nin": UNDELIVERED_EXAM_STATUSES}})
+    stats["completed_exams"] = await db.exams.count_documents({"user_id": user_id, "status": "completed"})
+    cursor = db.results.find({"user_id": user_id}, {"_id": 0, "percentage": 1, "subject_wise_score": 1})
+    async for result in cursor:
+        stats["results_count"] += 1
+        stats["percentage_sum"] += result["percentage"]
+        stats["best_percentage"] = max(stats["best_percentage"], result["percentage"])
+        for subject, score in result.get("subject_wise_score", {}).items():
+            totals = stats["subjects"].setdefault(stats_subject_key(subject), {"correct": 0, "total": 0})
+            totals["correct"] += score["correct"]
+            totals["total"] += score["total"]
+    await db.user_stats.update_one(
+        {"user_id": user_id},
+        {"$set": {**stats, "complete": True, "updated_at": datetime.utcnow()}},
+        upsert=True
+    )
+    return stats
+
+async def get_user_stats(user_id: str) -> dict:
+    stats = await db.user_stats.find_one({"user_id": user_id}, {"_id": 0})
+    if not stats or not stats.get("complete"):
+        # Increments alone may have created a partial document; rebuild it once from the source collections
+        stats = await rebuild_user_stats(user_id)
+    stats["subjects"] = {stats_subject_name(key): totals for key, totals in stats["subjects"].items()}
+    return stats
+
 # API Endpoints
 
 @api_router.post("/auth/register")
@@ -623,7 +1466,7 @@ async def register_user(user_data: UserRegistration, request: Request):
         raise HTTPException(status_code=400, detail="Email already registered")
     
     # Hash password
-    hashed_password = hash_password(user_data.password)
+    hashed_password = await hash_password(user_data.password)
     
     # Create user
     user = User(
@@ -638,7 +1481,12 @@ async def register_user(user_data: UserRegistration, request: Request):
     user_dict = user.dict()
     user_dict["password"] = hashed_password
     
-    await db.users.insert_one(user_dict)
+    try:
+        await db.users.insert_one(user_dict)
+    except DuplicateKeyError:
+        # A concurrent registration with the same email won the unique index
+        raise HTTPException(status_code=400, detail="Email already registered")
+    await init_user_stats(user.id)
     
     # Generate session ID and get device info
     session_id = str(uuid.uuid4())
@@ -659,9 +1507,19 @@ async def login_user(login_data: UserLogin, request: Request):
     if not user:
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
-    if not verify_password(login_data.password, user["password"]):
+    if not await verify_password(login_data.password, user["password"]):
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
+    # Upgrade hashes made with a different cost factor while we have the plaintext
+    if password_hasher.needs_rehash(user["password"]):
+        try:
+            await db.users.update_one(
+                {"id": user["id"], "password": user["password"]},
+                {"$set": {"password": await password_hasher.hash(login_data.password)}}
+            )
+        except PasswordHasherSaturated:
+            logger.info(f"Deferring password rehash for user {user['id']}; hasher is busy")
+    
     # Generate session ID and get device info
     session_id = str(uuid.uuid4())
     device_info = get_device_info(request)
@@ -680,11 +1538,7 @@ async def google_auth(google_data: GoogleAuth, request: Request):
     """Authenticate with Google OAuth"""
     try:
         # Verify Google token
-        id_info = id_token.verify_oauth2_token(
-            google_data.token, 
-            requests.Request(), 
-            os.environ['GOOGLE_CLIENT_ID']
-        )
+        id_info = await verify_google_id_token(google_data.token, os.environ['GOOGLE_CLIENT_ID'])
         
         google_id = id_info['sub']
         email = id_info['email']
@@ -704,7 +1558,12 @@ async def google_auth(google_data: GoogleAuth, request: Request):
                 profile_picture=profile_picture,
                 google_id=google_id
             )
-            await db.users.insert_one(user_obj.dict())
+            try:
+                await db.users.insert_one(user_obj.dict())
+                await init_user_stats(user_obj.id)
+            except DuplicateKeyError:
+                # A concurrent sign-in created the account first; use that one
+                user_obj = User(**await db.users.find_one({"email": email}))
         
         # Generate session ID and get device info
         session_id = str(uuid.uuid4())
@@ -720,6 +1579,8 @@ async def google_auth(google_data: GoogleAuth, request: Request):
         
     except ValueError as e:
         raise HTTPException(status_code=401, detail="Invalid Google token")
+    except GoogleCertsUnavailable:
+        raise HTTPException(status_code=503, detail="Google sign-in is temporarily unavailable", headers={"Retry-After": "5"})
 
 @api_router.get("/auth/me")
 async def get_current_user_info(current_user: User = Depends(get_current_user)):
@@ -729,11 +1590,10 @@ async def get_current_user_info(current_user: User = Depends(get_current_user)):
 @api_router.get("/auth/sessions")
 async def get_active_sessions(current_user: User = Depends(get_current_user)):
     """Get user's active sessions"""
-    user = await db.users.find_one({"id": current_user.id})
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
-    active_sessions = user.get("active_sessions", [])
+    active_sessions = await db.sessions.find(
+        {"user_id": current_user.id, "expires_at": {"$gt": datetime.utcnow()}},
+        {"_id": 0}
+    ).sort("created_at", 1).to_list(length=100)
     
     # Format sessions for display
     formatted_sessions = []
@@ -745,7 +1605,7 @@ async def get_active_sessions(current_user: User = Depends(get_current_user)):
             "browser": device_info.get("browser", "Unknown"),
             "ip_address": device_info.get("ip_address", "Unknown"),
             "login_time": session.get("created_at"),
-            "last_activity": session.get("last_activity")
+            "last_activity": session_activity.pending(session["session_id"]) or session.get("last_activity")
         })
     
     return {"active_sessions": formatted_sessions}
@@ -755,10 +1615,7 @@ async def logout_other_devices(current_user: User = Depends(get_current_user)):
     """Logout from all other devices except current one"""
     # Get current session from JWT token
     # This is a simplified version - in production you'd want to get the current session ID
-    await db.users.update_one(
-        {"id": current_user.id},
-        {"$set": {"active_sessions": []}}
-    )
+    await revoke_user_sessions(current_user.id)
     
     return {"message": "Logged out from all other devices"}
 
@@ -766,49 +1623,319 @@ async def logout_other_devices(current_user: User = Depends(get_current_user)):
 async def logout_user(current_user: User = Depends(get_current_user)):
     """Logout current user"""
     # Remove current session
-    await db.users.update_one(
-        {"id": current_user.id},
-        {"$set": {"active_sessions": []}}
-    )
+    await revoke_user_sessions(current_user.id)
     
     return {"message": "Logged out successfully"}
 
-@api_router.post("/exams/create")
-async def create_exam(exam_config: ExamConfig, current_user: User = Depends(get_current_user)):
-    """Create a new exam with AI-generated questions"""
+def delivery_questions(questions: List[Question]) -> List[DeliveryQuestion]:
+    return [DeliveryQuestion(**question.dict()) for question in questions]
+
+def answer_key_entries(questions: List[Question]) -> List[AnswerKeyEntry]:
+    return [
+        AnswerKeyEntry(
+            question_id=question.id,
+            correct_index=question.correct_index,
+            correct_answer=question.correct_answer,
+            solution=question.solution
+        )
+        for question in questions
+    ]
+
+async def load_answer_key(exam: dict) -> Dict[str, AnswerKeyEntry]:
+    """Answer key of an exam by question id
+
+    Exams stored before the split still carry answers inline; those are read from the questions.
+    """
+    key = await db.answer_keys.find_one({"exam_id": exam["id"]}, {"_id": 0, "answers": 1})
+    if key:
+        entries = [AnswerKeyEntry(**entry) for entry in key["answers"]]
+    else:
+        entries = [
+            AnswerKeyEntry(question_id=q["id"], correct_index=q["correct_index"], correct_answer=q["correct_answer"], solution=q["solution"])
+            for q in exam.get("questions", []) if "correct_index" in q
+        ]
+    return {entry.question_id: entry for entry in entries}
+
+async def run_exam_generation(exam_id: str, user_id: str, exam_config: ExamConfig, progress: GenerationProgress):
+    """Generate an exam's questions in the background and record the outcome"""
+    await db.generation_jobs.update_one(
+        {"exam_id": exam_id, "status": "pending"},
+        {"$set": {"status": "running", "started_at": datetime.utcnow(), "updated_at": datetime.utcnow()}}
+    )
     try:
-        logger.info(f"Creating exam for user {current_user.id}: {exam_config.exam_type}, {exam_config.question_count} questions")
-        
         # Generate questions using AI with robust error handling
-        questions = await generate_questions_with_gemini(exam_config)
+        questions = await generate_questions_with_gemini(exam_config, progress, user_id)
         
         if len(questions) < exam_config.question_count:
             logger.warning(f"Generated {len(questions)} questions, requested {exam_config.question_count}")
         
-        # Create exam
-        exam = Exam(
-            user_id=current_user.id,
-            exam_type=exam_config.exam_type,
-            configuration=exam_config,
-            questions=questions,
-            duration=exam_config.duration
+        # Answer key first so a visible exam always has one
+        await db.answer_keys.update_one(
+            {"exam_id": exam_id},
+            {"$set": {
+                "user_id": user_id,
+                "answers": [entry.dict() for entry in answer_key_entries(questions)],
+                "created_at": datetime.utcnow()
+            }},
+            upsert=True
         )
+        # Only while still generating; a job already failed as abandoned stays failed
+        exam = await db.exams.find_one_and_update(
+            {"id": exam_id, "status": "generating"},
+            {"$set": {"questions": [question.dict() for question in delivery_questions(questions)], "status": "created"}},
+            projection={"_id": 0},
+            return_document=ReturnDocument.AFTER
+        )
+        if exam is None:
+            logger.warning(f"Discarding questions for exam {exam_id}; it was marked failed while generating")
+            await progress.finished(error="Exam generation was abandoned. Please try again.")
+            return
+        # Only exams that actually got questions count as taken
+        await record_exam_created(user_id)
+        await db.generation_jobs.update_one(
+            {"exam_id": exam_id, "status": "running"},
+            {"$set": {
+                "status": "completed",
+                "question_count": len(questions),
+                "completed_at": datetime.utcnow(),
+                "updated_at": datetime.utcnow()
+            }}
+        )
+        logger.info(f"Exam {exam_id} generated successfully with {len(questions)} questions")
+        await progress.finished(exam=Exam(**exam))
         
-        await db.exams.insert_one(exam.dict())
-        
-        logger.info(f"Exam created successfully with {len(questions)} questions")
-        return {"message": "Exam created successfully", "exam": exam}
+    except asyncio.CancelledError:
+        # Server shutting down; record it so the client stops waiting
+        error = "Exam generation was interrupted by a server restart. Please try again."
+        logger.warning(f"Generation of exam {exam_id} cancelled")
+        await fail_generation_jobs([exam_id], error)
+        await progress.finished(error=error)
+        raise
+    except Exception as e:
+        logger.error(f"Error generating exam {exam_id}: {str(e)}")
+        await fail_generation_jobs([exam_id], str(e))
+        await progress.finished(error=str(e))
+
+async def fail_generation_jobs(exam_ids: List[str], error: str):
+    """Mark unfinished generation jobs and their exams as failed"""
+    now = datetime.utcnow()
+    await db.generation_jobs.update_many(
+        {"exam_id": {"$in": exam_ids}, "status": {"$in": ["pending", "running"]}},
+        {"$set": {"status": "failed", "error": error, "completed_at": now, "updated_at": now}}
+    )
+    await db.exams.update_many({"id": {"$in": exam_ids}, "status": "generating"}, {"$set": {"status": "failed"}})
+
+async def fail_abandoned_generation_jobs(query: Optional[dict] = None) -> int:
+    """Fail unfinished jobs that have made no progress for GENERATION_JOB_STALE_AFTER seconds
+
+    Jobs only run as tasks in the process that created them, so one that stops
+    updating belongs to a worker that died without shutting down cleanly.
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=GENERATION_JOB_STALE_AFTER)
+    stale = await db.generation_jobs.find(
+        {**(query or {}), "status": {"$in": ["pending", "running"]}, "updated_at": {"$lt": cutoff}},
+        {"_id": 0, "exam_id": 1}
+    ).to_list(length=None)
+    if stale:
+        await fail_generation_jobs(
+            [job["exam_id"] for job in stale],
+            "Exam generation stopped responding, most likely because the server restarted. Please try again."
+        )
+        logger.warning(f"Marked {len(stale)} abandoned generation jobs as failed")
+    return len(stale)
+
+async def start_exam_generation(exam_config: ExamConfig, user_id: str, progress_class=GenerationProgress) -> GenerationProgress:
+    """Store an exam shell plus its generation job and start generating in the background"""
+    # Create exam shell; questions are filled in by the generation job
+    exam = Exam(
+        user_id=user_id,
+        exam_type=exam_config.exam_type,
+        configuration=exam_config,
+        questions=[],
+        duration=exam_config.duration,
+        status="generating"
+    )
+    await db.exams.insert_one(exam.dict())
+    
+    questions_per_subject = calculate_questions_per_subject(exam_config)
+    await db.generation_jobs.insert_one({
+        "exam_id": exam.id,
+        "user_id": user_id,
+        "status": "pending",
+        "total_questions": exam_config.question_count,
+        "generated_questions": 0,
+        "subjects": [
+            {
+                "subject": subject,
+                "requested": count,
+                "from_bank": 0,
+                "generated": 0,
+                "chunks_total": 0,
+                "chunk_attempts": 0,
+                "chunks_completed": 0,
+                "chunks_failed": 0
+            }
+            for subject, count in questions_per_subject.items()
+        ],
+        "failures": [],
+        "created_at": datetime.utcnow(),
+        "updated_at": datetime.utcnow()
+    })
+    
+    progress = progress_class(exam.id, list(questions_per_subject))
+    task = asyncio.create_task(run_exam_generation(exam.id, user_id, exam_config, progress))
+    generation_tasks.add(task)
+    task.add_done_callback(generation_tasks.discard)
+    return progress
+
+@api_router.post("/exams/create")
+async def create_exam(exam_config: ExamConfig, current_user: User = Depends(get_current_user)):
+    """Create a new exam and generate its AI questions in the background"""
+    try:
+        logger.info(f"Creating exam for user {current_user.id}: {exam_config.exam_type}, {exam_config.question_count} questions")
+        progress = await start_exam_generation(exam_config, current_user.id)
+        return {"message": "Exam generation started", "exam_id": progress.exam_id, "status": "generating"}
         
     except Exception as e:
         logger.error(f"Error creating exam: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to create exam: {str(e)}")
 
+@api_router.post("/exams/create/stream")
+async def create_exam_stream(exam_config: ExamConfig, current_user: User = Depends(get_current_user)):
+    """Create a new exam, streaming question batches as NDJSON as each chunk completes
+
+    Streamed batches are a preview: the exam can only be started once the final
+    "exam" event arrives (its status is then "created").
+    """
+    try:
+        logger.info(f"Creating streamed exam for user {current_user.id}: {exam_config.exam_type}, {exam_config.question_count} questions")
+        progress = await start_exam_generation(exam_config, current_user.id, StreamingGenerationProgress)
+    except Exception as e:
+        logger.error(f"Error creating exam: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to create exam: {str(e)}")
+    
+    async def event_stream():
+        # Generation keeps running if the client disconnects; the job record stays authoritative
+        yield json.dumps({"type": "started", "exam_id": progress.exam_id}) + "\n"
+        while True:
+            event = await progress.events.get()
+            yield json.dumps(jsonable_encoder(event)) + "\n"
+            if event["type"] in ("exam", "error"):
+                break
+    
+    return StreamingResponse(event_stream(), media_type="application/x-ndjson")
+
 @api_router.get("/exams/generation-status/{exam_id}")
 async def get_generation_status(exam_id: str, current_user: User = Depends(get_current_user)):
-    """Get the status of exam question generation (for future use with async generation)"""
-    # This endpoint can be used for real-time progress tracking in the future
-    # For now, return that generation is complete
-    return {"status": "completed", "progress": 100}
+    """Get the progress of an exam's background question generation"""
+    query = {"exam_id": exam_id, "user_id": current_user.id}
+    job = await db.generation_jobs.find_one(query, {"_id": 0})
+    if not job:
+        raise HTTPException(status_code=404, detail="Generation job not found")
+    if job["status"] in ("pending", "running") and await fail_abandoned_generation_jobs(query):
+        job = await db.generation_jobs.find_one(query, {"_id": 0})
+    
+    total = job["total_questions"]
+    generated = min(job.get("generated_questions", 0), total)
+    progress = 100 if job["status"] == "completed" else int(generated / total * 100) if total else 0
+    
+    # Estimate remaining time from the observed generation rate
+    eta_seconds = None
+    started_at = job.get("started_at")
+    if job["status"] == "running" and started_at and generated > 0:
+        elapsed = (datetime.utcnow() - started_at).total_seconds()
+        eta_seconds = round(elapsed / generated * (total - generated), 1)
+    elif job["status"] == "completed":
+        eta_seconds = 0
+    
+    return {
+        "exam_id": exam_id,
+        "status": job["status"],
+        "progress": progress,
+        "total_questions": total,
+        "generated_questions": generated,
+        "eta_seconds": eta_seconds,
+        "subjects": job.get("subjects", []),
+        "failures": job.get("failures", []),
+        "error": job.get("error")
+    }
+
+# History pages: keyset pagination on (created_at, tie-breaker) newest first, summary fields only
+HISTORY_PAGE_SIZE = 20
+HISTORY_MAX_PAGE_SIZE = 100
+
+EXAM_SUMMARY_PROJECTION = {
+    "_id": 0, "id": 1, "exam_type": 1, "status": 1, "duration": 1, "created_at": 1, "start_time": 1, "end_time": 1,
+    "configuration.subjects": 1, "configuration.question_count": 1, "configuration.difficulty": 1
+}
+RESULT_SUMMARY_PROJECTION = {
+    "_id": 0, "exam_id": 1, "score": 1, "total_questions": 1, "correct_answers": 1,
+    "percentage": 1, "time_taken": 1, "subject_wise_score": 1, "created_at": 1
+}
+
+def encode_history_cursor(created_at: datetime, tie_breaker: str) -> str:
+    raw = json.dumps({"created_at": created_at.isoformat(), "id": tie_breaker})
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+def decode_history_cursor(cursor: str) -> tuple:
+    try:
+        raw = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return datetime.fromisoformat(raw["created_at"]), str(raw["id"])
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+async def history_page(collection, user_id: str, tie_field: str, projection: dict, limit: int, cursor: Optional[str]) -> dict:
+    """One page of a user's documents, newest first, continuing after `cursor`"""
+    query = {"user_id": user_id}
+    if cursor:
+        created_at, tie_breaker = decode_history_cursor(cursor)
+        query["$or"] = [
+            {"created_at": {"$lt": created_at}},
+            {"created_at": created_at, tie_field: {"$lt": tie_breaker}}
+        ]
+    
+    # One extra document tells us whether another page exists
+    docs = await collection.find(query, {**projection, tie_field: 1, "created_at": 1}) \
+        .sort([("created_at", -1), (tie_field, -1)]).limit(limit + 1).to_list(length=limit + 1)
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        next_cursor = encode_history_cursor(docs[-1]["created_at"], docs[-1][tie_field])
+    return {"items": docs, "next_cursor": next_cursor}
+
+@api_router.get("/exams/history")
+async def get_exam_history(
+    limit: int = Query(HISTORY_PAGE_SIZE, ge=1, le=HISTORY_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
+    """Page through the user's exams, newest first; pass next_cursor back to continue"""
+    page = await history_page(db.exams, current_user.id, "id", EXAM_SUMMARY_PROJECTION, limit, cursor)
+    page["items"] = [
+        {
+            "id": exam["id"],
+            "exam_type": exam["exam_type"],
+            "status": exam["status"],
+            "subjects": exam.get("configuration", {}).get("subjects", []),
+            "question_count": exam.get("configuration", {}).get("question_count"),
+            "difficulty": exam.get("configuration", {}).get("difficulty"),
+            "duration": exam["duration"],
+            "created_at": exam["created_at"],
+            "start_time": exam.get("start_time"),
+            "end_time": exam.get("end_time")
+        }
+        for exam in page["items"]
+    ]
+    return page
+
+@api_router.get("/results/history")
+async def get_result_history(
+    limit: int = Query(HISTORY_PAGE_SIZE, ge=1, le=HISTORY_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
+    """Page through the user's results without per-question analysis, newest first"""
+    return await history_page(db.results, current_user.id, "exam_id", RESULT_SUMMARY_PROJECTION, limit, cursor)
 
 @api_router.get("/exams/{exam_id}")
 async def get_exam(exam_id: str, current_user: User = Depends(get_current_user)):
@@ -826,6 +1953,8 @@ async def start_exam(exam_id: str, current_user: User = Depends(get_current_user
     if not exam:
         raise HTTPException(status_code=404, detail="Exam not found")
     
+    if exam["status"] == "generating":
+        raise HTTPException(status_code=409, detail="Exam questions are still being generated")
     if exam["status"] != "created":
         raise HTTPException(status_code=400, detail="Exam already started or completed")
     
@@ -849,6 +1978,7 @@ async def submit_exam(exam_id: str, submission: ExamSubmission, current_user: Us
     
     # Calculate results
     exam_obj = Exam(**exam)
+    answer_key = await load_answer_key(exam)
     correct_answers = 0
     total_questions = len(exam_obj.questions)
     subject_wise_score = {}
@@ -856,8 +1986,9 @@ async def submit_exam(exam_id: str, submission: ExamSubmission, current_user: Us
     
     for i, question in enumerate(exam_obj.questions):
         question_id = str(i)
+        answer = answer_key[question.id]
         user_answer = submission.answers.get(question_id)
-        is_correct = user_answer == question.correct_index if user_answer is not None else False
+        is_correct = user_answer == answer.correct_index if user_answer is not None else False
         
         if is_correct:
             correct_answers += 1
@@ -869,15 +2000,11 @@ async def submit_exam(exam_id: str, submission: ExamSubmission, current_user: Us
         if is_correct:
             subject_wise_score[question.subject]["correct"] += 1
         
-        # Detailed analysis
+        # Detailed analysis stores only per-question outcomes; content is joined back in on demand
         detailed_analysis.append({
             "question_id": question_id,
-            "question": question.question,
-            "options": question.options,
-            "correct_answer": question.correct_index,
             "user_answer": user_answer,
             "is_correct": is_correct,
-            "solution": question.solution,
             "subject": question.subject,
             "topic": question.topic
         })
@@ -911,69 +2038,98 @@ async def submit_exam(exam_id: str, submission: ExamSubmission, current_user: Us
     
     # Save result
     await db.results.insert_one(result.dict())
+    await record_exam_result(result)
     
+    # The submitting client gets the full analysis; everything needed is already in memory
+    result.detailed_analysis = hydrate_analysis(detailed_analysis, exam_obj.questions, answer_key)
     return {"message": "Exam submitted successfully", "result": result}
 
+def hydrate_analysis(analysis: List[Dict[str, Any]], questions: List[DeliveryQuestion], answer_key: Dict[str, AnswerKeyEntry]) -> List[Dict[str, Any]]:
+    """Join question text, options, correct answer and solution onto stored per-question outcomes"""
+    hydrated = []
+    for entry in analysis:
+        index = int(entry["question_id"])
+        if "question" in entry or index >= len(questions):
+            hydrated.append(entry)  # Results stored before the split already carry their content
+            continue
+        question = questions[index]
+        answer = answer_key.get(question.id)
+        hydrated.append({
+            "question_id": entry["question_id"],
+            "question": question.question,
+            "options": question.options,
+            "correct_answer": answer.correct_index if answer else None,
+            "user_answer": entry["user_answer"],
+            "is_correct": entry["is_correct"],
+            "solution": answer.solution if answer else "",
+            "subject": entry["subject"],
+            "topic": entry["topic"]
+        })
+    return hydrated
+
 @api_router.get("/exams/{exam_id}/result")
-async def get_exam_result(exam_id: str, current_user: User = Depends(get_current_user)):
-    """Get exam result"""
-    result = await db.results.find_one({"exam_id": exam_id, "user_id": current_user.id})
+async def get_exam_result(exam_id: str, detail: bool = False, current_user: User = Depends(get_current_user)):
+    """Get exam result; with `detail`, each question's text, options, answer and solution are included"""
+    result = await db.results.find_one({"exam_id": exam_id, "user_id": current_user.id}, {"_id": 0})
     if not result:
         raise HTTPException(status_code=404, detail="Result not found")
     
+    analysis = result.get("detailed_analysis", [])
+    if detail and any("question" not in entry for entry in analysis):
+        exam = await db.exams.find_one({"id": exam_id, "user_id": current_user.id}, {"_id": 0, "id": 1, "questions": 1})
+        if exam:
+            questions = [DeliveryQuestion(**question) for question in exam.get("questions", [])]
+            result["detailed_analysis"] = hydrate_analysis(analysis, questions, await load_answer_key(exam))
+    
     return ExamResult(**result)
 
 @api_router.get("/dashboard")
 async def get_dashboard(current_user: User = Depends(get_current_user)):
     """Get user dashboard data"""
-    # Get user's exams
-    exams_cursor = db.exams.find({"user_id": current_user.id})
-    exams = await exams_cursor.to_list(length=100)
-    
-    # Get user's results
-    results_cursor = db.results.find({"user_id": current_user.id})
-    results = await results_cursor.to_list(length=100)
-    
-    # Clean up MongoDB documents (remove _id fields)
-    clean_exams = []
-    for exam in exams:
-        if '_id' in exam:
-            del exam['_id']
-        clean_exams.append(exam)
-    
-    clean_results = []
-    for result in results:
-        if '_id' in result:
-            del result['_id']
-        clean_results.append(result)
-    
-    # Calculate statistics
-    total_exams = len(clean_exams)
-    completed_exams = len([e for e in clean_exams if e["status"] == "completed"])
-    
-    if clean_results:
-        avg_score = sum(r["percentage"] for r in clean_results) / len(clean_results)
-        best_score = max(r["percentage"] for r in clean_results)
-    else:
-        avg_score = 0
-        best_score = 0
+    stats = await get_user_stats(current_user.id)
+    
+    # Only the five most recent of each, without question payloads or per-question analysis (oldest first);
+    # exams still generating or that failed to generate are not shown
+    recent_exams = await db.exams.find(
+        {"user_id": current_user.id, "status": {"$nin": UNDELIVERED_EXAM_STATUSES}}, {"_id": 0, "questions": 0}
+    ).sort("created_at", -1).limit(5).to_list(length=5)
+    recent_results = await db.results.find({"user_id": current_user.id}, {"_id": 0, "detailed_analysis": 0}) \
+        .sort("created_at", -1).limit(5).to_list(length=5)
+    
+    avg_score = stats["percentage_sum"] / stats["results_count"] if stats["results_count"] else 0
     
     return {
         "user": current_user.dict(),
         "stats": {
-            "total_exams": total_exams,
-            "completed_exams": completed_exams,
+            "total_exams": stats["total_exams"],
+            "completed_exams": stats["completed_exams"],
             "average_score": round(avg_score, 2),
-            "best_score": round(best_score, 2)
+            "best_score": round(stats["best_percentage"], 2),
+            "subjects": stats["subjects"]
         },
-        "recent_exams": clean_exams[-5:] if clean_exams else [],
-        "recent_results": clean_results[-5:] if clean_results else []
+        "recent_exams": recent_exams[::-1],
+        "recent_results": recent_results[::-1]
     }
 
 @api_router.get("/")
 async def root():
     return {"message": "JEE/NEET/EAMCET Exam Portal API"}
 
+@api_router.get("/health/llm")
+async def llm_health(current_user: User = Depends(get_current_user)):
+    """Report Gemini executor queue depth/utilization, rate limiter, circuit breaker and hedging state"""
+    return {
+        "executor": gemini_executor.stats(),
+        "rate_limiter": gemini_limiter.stats(),
+        "circuit_breaker": gemini_breaker.stats(),
+        "hedging": hedge_budget.stats()
+    }
+
+@api_router.get("/health/indexes")
+async def index_health(current_user: User = Depends(get_current_user)):
+    """Report missing, undeclared and unused indexes for every managed collection"""
+    return {"failed": index_manager.failed, "collections": await index_manager.report(db)}
+
 # Include router
 app.include_router(api_router)
 
@@ -986,8 +2142,101 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Every index the queries above rely on; ensured at startup before anything else runs
+index_manager = IndexManager([
+    IndexSpec("users", "email", unique=True),
+    IndexSpec("users", "id", unique=True),
+    IndexSpec("sessions", "session_id", unique=True),
+    IndexSpec("sessions", [("user_id", 1), ("created_at", -1)]),
+    IndexSpec("sessions", "expires_at", expireAfterSeconds=0),
+    IndexSpec("revoked_sessions", "expires_at", expireAfterSeconds=0),
+    IndexSpec("exams", "id", unique=True),
+    IndexSpec("exams", [("user_id", 1), ("created_at", -1), ("id", -1)]),
+    IndexSpec("results", [("exam_id", 1), ("user_id", 1)]),
+    IndexSpec("results", [("user_id", 1), ("created_at", -1), ("exam_id", -1)]),
+    IndexSpec("answer_keys", "exam_id", unique=True),
+    IndexSpec("user_stats", "user_id", unique=True),
+    IndexSpec("generation_jobs", "exam_id", unique=True),
+    IndexSpec("generation_jobs", [("status", 1), ("updated_at", 1)]),
+    IndexSpec("generation_cache", [("key", 1), ("last_used_at", 1)]),
+    IndexSpec("generation_cache", "last_used_at"),
+    IndexSpec("generation_cache", "expires_at", expireAfterSeconds=0),
+    IndexSpec("question_bank", [("exam_type", 1), ("subject", 1), ("difficulty", 1), ("topic", 1)]),
+    IndexSpec("question_bank", "id"),
+    IndexSpec("question_bank", "claimed_by"),
+    IndexSpec("question_bank_demand", "last_drawn_at"),
+])
+
+@app.on_event("startup")
+async def ensure_indexes():
+    await index_manager.ensure(db)
+    await index_manager.log_report(db)
+
+@app.on_event("startup")
+async def load_sessions():
+    await migrate_embedded_sessions()
+    await load_revoked_sessions()
+
+async def migrate_embedded_sessions():
+    """Move sessions still embedded in user documents into db.sessions"""
+    migrated = 0
+    cursor = db.users.find({"active_sessions.0": {"$exists": True}}, {"_id": 0, "id": 1, "active_sessions": 1})
+    async for user in cursor:
+        for session in user["active_sessions"]:
+            created_at = session.get("created_at") or datetime.utcnow()
+            await db.sessions.update_one(
+                {"session_id": session["session_id"]},
+                {"$setOnInsert": {
+                    "user_id": user["id"],
+                    "device_info": session.get("device_info", {}),
+                    "created_at": created_at,
+                    "last_activity": session.get("last_activity") or created_at,
+                    "expires_at": created_at + timedelta(hours=JWT_EXPIRATION)
+                }},
+                upsert=True
+            )
+            migrated += 1
+    await db.users.update_many({"active_sessions.0": {"$exists": True}}, {"$unset": {"active_sessions": ""}})
+    if migrated:
+        logger.info(f"Migrated {migrated} embedded sessions to the sessions collection")
+
+@app.on_event("startup")
+async def recover_generation_jobs():
+    await fail_abandoned_generation_jobs()
+
+@app.on_event("startup")
+async def start_activity_flush():
+    global activity_flush_task
+    activity_flush_task = asyncio.create_task(activity_flush_worker())
+
+@app.on_event("startup")
+async def start_google_certs():
+    if os.environ.get('GOOGLE_CLIENT_ID'):
+        await google_certs.start()
+
+@app.on_event("startup")
+async def start_question_bank():
+    global question_bank_task
+    if not QUESTION_BANK_ENABLED:
+        return
+    await load_question_bank_index()
+    question_bank_task = asyncio.create_task(question_bank_worker())
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    # Cancelled jobs record themselves as failed, so finish that before the client closes
+    for task in generation_tasks:
+        task.cancel()
+    if generation_tasks:
+        await asyncio.wait(list(generation_tasks), timeout=GENERATION_SHUTDOWN_GRACE)
+    if question_bank_task:
+        question_bank_task.cancel()
+    if activity_flush_task:
+        activity_flush_task.cancel()
+    await flush_activity()
+    gemini_executor.shutdown()
+    password_hasher.shutdown()
+    google_certs.stop()
     client.close()
 
 if __name__ == "__main__":
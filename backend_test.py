@@ -7,6 +7,9 @@ from dotenv import load_dotenv
 import sys
 import uuid
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+from question_validator import validate_question, find_forbidden_phrase
+
 # Load environment variables from frontend/.env to get the backend URL
 load_dotenv('/app/frontend/.env')
 
@@ -473,41 +476,45 @@ def test_logout_other_devices():
         print(f"❌ Logout Other Devices Test: FAILED - {str(e)}")
         return False
 
+def create_exam_and_wait(exam_config, headers, timeout=300):
+    """Start exam generation and poll until it finishes; returns (status_code, response_json)"""
+    response = requests.post(f"{API_URL}/exams/create", json=exam_config, headers=headers)
+    if response.status_code != 200:
+        return response.status_code, response.json()
+    
+    exam_id = response.json()["exam_id"]
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        status_response = requests.get(f"{API_URL}/exams/generation-status/{exam_id}", headers=headers)
+        generation = status_response.json()
+        if generation.get("status") == "completed":
+            break
+        if generation.get("status") == "failed":
+            return 500, {"detail": generation.get("error")}
+        time.sleep(2)
+    else:
+        return 504, {"detail": f"Exam generation did not finish within {timeout}s"}
+    
+    exam_response = requests.get(f"{API_URL}/exams/{exam_id}", headers=headers)
+    return exam_response.status_code, {"exam": exam_response.json()}
+
 def analyze_question_quality(questions):
     """Analyze the quality of generated questions"""
     print("\nAnalyzing Question Quality...")
     
-    # Forbidden phrases that should not appear in questions
-    forbidden_phrases = [
-        "sample", "Sample", "SAMPLE",
-        "question 1", "Question 1", "QUESTION 1",
-        "option a for", "Option A for", "OPTION A FOR",
-        "placeholder", "Placeholder", "PLACEHOLDER",
-        "example question", "Example Question", "EXAMPLE QUESTION",
-        "template", "Template", "TEMPLATE"
-    ]
-    
     quality_issues = []
     sample_questions = []
     
     for i, question in enumerate(questions):
-        question_text = question["question"]
-        
-        # Check for forbidden phrases
-        for phrase in forbidden_phrases:
-            if phrase.lower() in question_text.lower():
-                quality_issues.append(f"Question {i+1} contains forbidden phrase: '{phrase}'")
-                sample_questions.append(question_text)
-                break
-        
-        # Check for minimum length (too short questions are likely generic)
-        if len(question_text.split()) < 8:
-            quality_issues.append(f"Question {i+1} is too short: '{question_text}'")
-        
-        # Check for generic options
-        for j, option in enumerate(question["options"]):
-            if f"Option {chr(65+j)}" in option or f"option {chr(97+j)}" in option:
-                quality_issues.append(f"Question {i+1} has generic option: '{option}'")
+        # Same checks the server applies before accepting a generated question; solutions aren't delivered with the exam
+        rejections = [
+            rejection for rejection in validate_question(question, min_question_words=8, collect_all=True)
+            if rejection.field != "solution"
+        ]
+        for rejection in rejections:
+            quality_issues.append(f"Question {i+1} {rejection}")
+        if any(rejection.code == "forbidden_phrase" for rejection in rejections):
+            sample_questions.append(question["question"])
     
     # Print quality analysis
     if quality_issues:
@@ -569,11 +576,10 @@ def test_exam_creation(exam_type="JEE Main", subjects=None):
         
         headers = {"Authorization": f"Bearer {token}"}
         print("Sending exam creation request...")
-        response = requests.post(f"{API_URL}/exams/create", json=exam_config, headers=headers)
-        print(f"Status Code: {response.status_code}")
+        status_code, response_json = create_exam_and_wait(exam_config, headers)
+        print(f"Status Code: {status_code}")
         
         # Print a truncated response to avoid overwhelming the console
-        response_json = response.json()
         if "exam" in response_json and "questions" in response_json["exam"]:
             question_count = len(response_json["exam"]["questions"])
             print(f"Received {question_count} questions in response")
@@ -588,7 +594,7 @@ def test_exam_creation(exam_type="JEE Main", subjects=None):
             print(f"Response: {response_json}")
             questions_quality = False
         
-        assert response.status_code == 200, "Exam creation failed"
+        assert status_code == 200, "Exam creation failed"
         assert "exam" in response_json, "Response missing 'exam' field"
         assert "questions" in response_json["exam"], "Response missing 'questions' field"
         assert response_json["exam"]["exam_type"] == exam_type, f"Exam type mismatch: expected {exam_type}"
@@ -639,34 +645,24 @@ def test_question_validation():
             
             headers = {"Authorization": f"Bearer {token}"}
             print(f"Creating exam with subject: {subjects[0]}...")
-            response = requests.post(f"{API_URL}/exams/create", json=exam_config, headers=headers)
+            status_code, response_json = create_exam_and_wait(exam_config, headers)
             
-            if response.status_code == 200 and "exam" in response.json() and "questions" in response.json()["exam"]:
-                all_questions.extend(response.json()["exam"]["questions"])
+            if status_code == 200 and "exam" in response_json and "questions" in response_json["exam"]:
+                all_questions.extend(response_json["exam"]["questions"])
         
         print(f"Collected {len(all_questions)} questions for validation testing")
         
         # Check for forbidden phrases in all collected questions
-        forbidden_phrases = [
-            "sample", "Sample", "SAMPLE",
-            "question 1", "Question 1", "QUESTION 1",
-            "option a for", "Option A for", "OPTION A FOR",
-            "placeholder", "Placeholder", "PLACEHOLDER",
-            "example question", "Example Question", "EXAMPLE QUESTION",
-            "template", "Template", "TEMPLATE"
-        ]
-        
         sample_questions_found = []
         
         for question in all_questions:
             question_text = question["question"]
-            for phrase in forbidden_phrases:
-                if phrase.lower() in question_text.lower():
-                    sample_questions_found.append({
-                        "question": question_text,
-                        "forbidden_phrase": phrase
-                    })
-                    break
+            phrase = find_forbidden_phrase(question_text)
+            if phrase:
+                sample_questions_found.append({
+                    "question": question_text,
+                    "forbidden_phrase": phrase
+                })
         
         if sample_questions_found:
             print(f"❌ Found {len(sample_questions_found)} questions with forbidden phrases:")
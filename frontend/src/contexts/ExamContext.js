@@ -13,6 +13,8 @@ export const useExam = () => {
 };
 
 const API_BASE_URL = process.env.REACT_APP_BACKEND_URL + '/api';
+const GENERATION_POLL_INTERVAL = 2000; // ms
+const GENERATION_TIMEOUT = 300000; // ms; give up polling a job that never finishes
 
 export const ExamProvider = ({ children }) => {
   const [currentExam, setCurrentExam] = useState(null);
@@ -38,7 +40,31 @@ export const ExamProvider = ({ children }) => {
     
     try {
       const response = await axios.post(`${API_BASE_URL}/exams/create`, examConfig);
-      const exam = response.data.exam;
+      const examId = response.data.exam_id;
+      
+      // Poll the background generation job until it finishes
+      let status = response.data;
+      const deadline = Date.now() + GENERATION_TIMEOUT;
+      while (status.status !== 'completed') {
+        if (status.status === 'failed') {
+          throw new Error(status.error || 'Failed to create exam');
+        }
+        if (Date.now() > deadline) {
+          throw new Error('Exam generation is taking too long. Please try again later.');
+        }
+        await new Promise((resolve) => setTimeout(resolve, GENERATION_POLL_INTERVAL));
+        const statusResponse = await axios.get(`${API_BASE_URL}/exams/generation-status/${examId}`);
+        status = statusResponse.data;
+        if (status.status === 'running') {
+          toast.loading(`Generating questions... ${status.generated_questions}/${status.total_questions}`, {
+            id: 'exam-creation',
+            duration: 300000
+          });
+        }
+      }
+      
+      const examResponse = await axios.get(`${API_BASE_URL}/exams/${examId}`);
+      const exam = examResponse.data;
       
       setCurrentExam(exam);
       toast.success(`Exam created with ${exam.questions.length} questions!`, { 
@@ -48,7 +74,7 @@ export const ExamProvider = ({ children }) => {
       
       return { success: true, exam };
     } catch (error) {
-      const message = error.response?.data?.detail || 'Failed to create exam';
+      const message = error.response?.data?.detail || error.message || 'Failed to create exam';
       toast.error(message, { id: 'exam-creation', duration: 2000 });
       return { success: false, error: message };
     } finally {
@@ -142,7 +168,7 @@ export const ExamProvider = ({ children }) => {
   const getExamResult = async (examId) => {
     setExamLoading(true);
     try {
-      const response = await axios.get(`${API_BASE_URL}/exams/${examId}/result`);
+      const response = await axios.get(`${API_BASE_URL}/exams/${examId}/result`, { params: { detail: true } });
       const result = response.data;
       
       setExamResults(result);
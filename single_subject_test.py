@@ -5,6 +5,8 @@ import os
 from dotenv import load_dotenv
 import sys
 
+from backend_test import create_exam_and_wait
+
 # Load environment variables from frontend/.env to get the backend URL
 load_dotenv('/app/frontend/.env')
 
@@ -53,11 +55,10 @@ def test_single_subject_exam_creation(exam_type="NEET", subject="Biology"):
         
         headers = {"Authorization": f"Bearer {token}"}
         print(f"Sending exam creation request for {subject} only...")
-        response = requests.post(f"{API_URL}/exams/create", json=exam_config, headers=headers)
-        print(f"Status Code: {response.status_code}")
+        status_code, response_json = create_exam_and_wait(exam_config, headers)
+        print(f"Status Code: {status_code}")
         
         # Print the full response to see the generated questions
-        response_json = response.json()
         if "exam" in response_json and "questions" in response_json["exam"]:
             questions = response_json["exam"]["questions"]
             print(f"Received {len(questions)} questions")
@@ -69,7 +70,6 @@ def test_single_subject_exam_creation(exam_type="NEET", subject="Biology"):
                 print("Options:")
                 for j, option in enumerate(question['options']):
                     print(f"  {chr(65+j)}. {option}")
-                print(f"Correct Answer: {question['correct_answer']}")
                 print(f"Subject: {question['subject']}")
                 print(f"Topic: {question['topic']}")
                 
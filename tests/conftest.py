@@ -0,0 +1,57 @@
+import os
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+# The backend modules import each other by bare name, as when run from backend/
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+# Tests never call Gemini; set before any test module imports server
+os.environ.setdefault("QUESTION_PROVIDER", "fake")
+
+
+@pytest.fixture
+def isolated_generation(monkeypatch):
+    """Install a question provider on the server with its own rate limiter and circuit breaker
+
+    Returns `install(provider, failure_threshold=5)`. The limiter's budget is generous so
+    throttling provoked by one test never slows down another.
+    """
+    import server
+    from circuit_breaker import CircuitBreaker
+    from rate_limiter import AdaptiveRateLimiter
+
+    def install(provider, failure_threshold: int = 5):
+        monkeypatch.setattr(server, "question_provider", provider)
+        monkeypatch.setattr(server, "gemini_limiter", AdaptiveRateLimiter(
+            requests_per_minute=6000, tokens_per_minute=10_000_000, max_concurrency=8, is_throttle_error=server.is_quota_error
+        ))
+        monkeypatch.setattr(server, "gemini_breaker", CircuitBreaker(
+            "gemini", failure_threshold=failure_threshold, reset_timeout=30, is_failure=server.is_upstream_failure
+        ))
+        return provider
+
+    return install
+
+
+class Clock:
+    """Manually advanced stand-in for time.monotonic"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def fake_clock(monkeypatch):
+    """Returns `install(module)`, which points that module's `time.monotonic` at a new Clock"""
+    def install(module) -> Clock:
+        clock = Clock()
+        monkeypatch.setattr(module, "time", SimpleNamespace(monotonic=clock))
+        return clock
+
+    return install
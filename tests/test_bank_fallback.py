@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+
+import server
+from question_providers import FakeQuestionProvider
+
+
+def banked_question(difficulty: str) -> server.Question:
+    return server.Question(
+        question=f"A banked {difficulty} physics question about projectile range?",
+        options=["10 m", "20 m", "30 m", "40 m"],
+        correct_index=1,
+        correct_answer="B",
+        solution="Range is u^2 sin 2θ / g, which gives 20 m here",
+        difficulty=difficulty,
+        subject="Physics",
+        topic="Kinematics",
+        exam_type="JEE Main"
+    )
+
+
+@pytest.fixture
+def offline_provider(monkeypatch, isolated_generation):
+    """Every provider call fails with a quota error; the bank holds only Hard questions"""
+    bank = [banked_question("Hard") for _ in range(4)]
+
+    async def draw_from_question_bank(exam_type, subject, difficulty, count):
+        matching = [q for q in bank if q.subject == subject and difficulty in (None, q.difficulty)][:count]
+        for question in matching:
+            bank.remove(question)
+        return matching
+
+    async def record_question_bank_demand(exam_type, subject, difficulty):
+        pass
+
+    isolated_generation(FakeQuestionProvider(latency_median=0, quota_error_rate=1.0), failure_threshold=2)
+    monkeypatch.setattr(server, "draw_from_question_bank", draw_from_question_bank)
+    monkeypatch.setattr(server, "record_question_bank_demand", record_question_bank_demand)
+    return bank
+
+
+def exam_config(difficulty: str = "Easy") -> server.ExamConfig:
+    return server.ExamConfig(exam_type="JEE Main", subjects=["Physics"], question_count=3,
+                             duration=60, difficulty=difficulty, generation_cache="bypass")
+
+
+def test_quota_failures_fall_back_to_banked_questions_of_any_difficulty(offline_provider):
+    questions = asyncio.run(server.collect_subject_questions("Physics", 3, exam_config()))
+
+    assert server.gemini_breaker.is_open()
+    assert len(questions) == 3
+    assert all(q.difficulty == "Hard" for q in questions)
+    assert len(offline_provider) == 1
+
+
+def test_generation_error_is_raised_when_the_bank_is_empty(offline_provider):
+    offline_provider.clear()
+
+    # Whichever chunk failed first: a quota error, or a retry refused by the now-open circuit
+    with pytest.raises(Exception, match="quota|circuit is open"):
+        asyncio.run(server.collect_subject_questions("Physics", 3, exam_config()))
+    assert server.gemini_breaker.is_open()
@@ -0,0 +1,122 @@
+import asyncio
+
+import pytest
+
+import circuit_breaker
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+
+
+class UpstreamError(Exception):
+    pass
+
+
+@pytest.fixture
+def clock(fake_clock):
+    return fake_clock(circuit_breaker)
+
+
+def breaker(**options) -> CircuitBreaker:
+    return CircuitBreaker("test", **{"failure_threshold": 3, "reset_timeout": 10, "max_reset_timeout": 30, **options})
+
+
+async def call(breaker: CircuitBreaker, error: Exception = None):
+    with await breaker.admit():
+        if error:
+            raise error
+
+
+async def fail(breaker: CircuitBreaker):
+    with pytest.raises(UpstreamError):
+        await call(breaker, UpstreamError())
+
+
+def test_opens_after_consecutive_failures(clock):
+    async def scenario():
+        b = breaker()
+        await fail(b)
+        await fail(b)
+        await call(b)  # A success resets the count
+        for _ in range(3):
+            await fail(b)
+        assert b.state == OPEN
+        with pytest.raises(CircuitOpenError):
+            await call(b)
+        assert b.rejected == 1
+
+    asyncio.run(scenario())
+
+
+def test_half_open_probe_success_closes(clock):
+    async def scenario():
+        b = breaker()
+        for _ in range(3):
+            await fail(b)
+
+        clock.now += 10
+        assert b.state == HALF_OPEN
+        await call(b)
+
+        assert b.state == CLOSED
+        assert b.stats()["reset_timeout"] == 10
+
+    asyncio.run(scenario())
+
+
+def test_failed_probe_reopens_with_doubled_timeout(clock):
+    async def scenario():
+        b = breaker()
+        for _ in range(3):
+            await fail(b)
+
+        clock.now += 10
+        await fail(b)
+        assert b.state == OPEN
+        assert b.retry_after == 20
+
+        clock.now += 20
+        await fail(b)
+        assert b.retry_after == 30  # Capped at max_reset_timeout
+
+        clock.now += 30
+        await call(b)
+        assert b.state == CLOSED
+        assert b.stats()["reset_timeout"] == 10
+
+    asyncio.run(scenario())
+
+
+def test_calls_during_probe_wait_for_its_outcome(clock):
+    async def scenario():
+        b = breaker()
+        for _ in range(3):
+            await fail(b)
+        clock.now += 10
+
+        release = asyncio.Event()
+
+        async def probe():
+            with await b.admit():
+                await release.wait()
+
+        probe_task = asyncio.create_task(probe())
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(call(b))
+        await asyncio.sleep(0)
+        assert not waiter.done()
+
+        release.set()
+        await asyncio.gather(probe_task, waiter)
+        assert b.state == CLOSED
+
+    asyncio.run(scenario())
+
+
+def test_only_matching_errors_count(clock):
+    async def scenario():
+        b = breaker(is_failure=lambda exc: isinstance(exc, UpstreamError))
+        for _ in range(5):
+            with pytest.raises(ValueError):
+                await call(b, ValueError())
+        assert b.state == CLOSED
+
+    asyncio.run(scenario())
@@ -0,0 +1,121 @@
+import asyncio
+import base64
+import json
+
+import httpx
+import pytest
+
+import google_certs
+from google_certs import GoogleCertCache, GoogleCertsUnavailable, token_key_id
+
+CERTS_URL = "https://certs.test/oauth2/v1/certs"
+
+
+class FakeGoogle:
+    """Serves a certificate set and counts fetches; set `status` to fail them"""
+
+    def __init__(self, certs: dict, cache_control: str = "public, max-age=600"):
+        self.certs = certs
+        self.cache_control = cache_control
+        self.status = 200
+        self.requests = 0
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        assert str(request.url) == CERTS_URL
+        if self.status != 200:
+            return httpx.Response(self.status)
+        return httpx.Response(200, json=self.certs, headers={"cache-control": self.cache_control})
+
+
+@pytest.fixture
+def clock(fake_clock):
+    return fake_clock(google_certs)
+
+
+def cache_for(google: FakeGoogle) -> GoogleCertCache:
+    return GoogleCertCache(CERTS_URL, min_refresh_interval=60, transport=httpx.MockTransport(google))
+
+
+def token(kid: str) -> str:
+    header = base64.urlsafe_b64encode(json.dumps({"alg": "RS256", "kid": kid}).encode()).rstrip(b"=").decode()
+    return f"{header}.payload.signature"
+
+
+def test_token_key_id():
+    assert token_key_id(token("abc")) == "abc"
+    assert token_key_id("not a jwt") is None
+
+
+def test_certs_are_cached_for_max_age(clock):
+    google = FakeGoogle({"k1": "cert-1"})
+    cache = cache_for(google)
+
+    async def scenario():
+        assert await cache.certs_for(token("k1")) == {"k1": "cert-1"}
+        clock.now += 599
+        await cache.certs_for(token("k1"))
+        assert google.requests == 1
+
+        clock.now += 1
+        google.certs = {"k2": "cert-2"}
+        assert await cache.certs_for(token("k2")) == {"k2": "cert-2"}
+        assert google.requests == 2
+
+    asyncio.run(scenario())
+
+
+def test_default_max_age_without_cache_control(clock):
+    google = FakeGoogle({"k1": "cert-1"}, cache_control="")
+    cache = cache_for(google)
+
+    async def scenario():
+        await cache.refresh()
+        clock.now += 3599
+        await cache.refresh()
+        assert google.requests == 1
+
+    asyncio.run(scenario())
+
+
+def test_unknown_key_id_forces_a_rate_limited_refresh(clock):
+    google = FakeGoogle({"k1": "cert-1"})
+    cache = cache_for(google)
+
+    async def scenario():
+        await cache.certs_for(token("k1"))
+        clock.now += 30
+        google.certs = {"k2": "cert-2"}
+
+        # Too soon after the last fetch: the rotated key is not picked up yet
+        assert "k2" not in await cache.certs_for(token("k2"))
+        assert google.requests == 1
+
+        clock.now += 30
+        assert "k2" in await cache.certs_for(token("k2"))
+        assert google.requests == 2
+
+    asyncio.run(scenario())
+
+
+def test_fetch_failure_keeps_serving_cached_certs(clock):
+    google = FakeGoogle({"k1": "cert-1"})
+    cache = cache_for(google)
+
+    async def scenario():
+        await cache.refresh()
+        google.status = 503
+        clock.now += 600
+        assert await cache.certs_for(token("k1")) == {"k1": "cert-1"}
+        assert cache.fetch_errors == 1
+
+    asyncio.run(scenario())
+
+
+def test_fetch_failure_without_cached_certs_raises(clock):
+    google = FakeGoogle({})
+    google.status = 500
+    cache = cache_for(google)
+
+    with pytest.raises(GoogleCertsUnavailable):
+        asyncio.run(cache.certs_for(token("k1")))
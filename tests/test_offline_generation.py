@@ -0,0 +1,34 @@
+import asyncio
+
+import pytest
+
+import server
+from question_dedup import NearDuplicateIndex
+from question_providers import FakeQuestionProvider
+
+
+@pytest.fixture
+def fake_provider(monkeypatch, isolated_generation):
+    """Offline provider that truncates, corrupts and pads some responses with invalid questions"""
+    provider = isolated_generation(FakeQuestionProvider(
+        seed=7, latency_median=0, truncation_rate=0.3, malformed_rate=0.1, rejection_rate=0.2
+    ))
+    monkeypatch.setattr(server, "QUESTION_BANK_ENABLED", False)
+    return provider
+
+
+def exam_config(count: int) -> server.ExamConfig:
+    return server.ExamConfig(exam_type="NEET", subjects=["Biology"], question_count=count,
+                             duration=60, difficulty="Medium", generation_cache="bypass")
+
+
+def test_chunked_generation_survives_bad_responses(fake_provider):
+    seen = NearDuplicateIndex()
+
+    questions = asyncio.run(server.generate_questions_chunk("Biology", 20, exam_config(20), seen=seen))
+
+    assert len(questions) == 20
+    assert len({q.id for q in questions}) == 20
+    assert all(q.subject == "Biology" and q.difficulty == "Medium" and q.exam_type == "NEET" for q in questions)
+    assert not any(q.question.startswith("Sample ") for q in questions)  # Placeholder questions are rejected
+    assert len(seen) == 20
@@ -0,0 +1,56 @@
+from question_dedup import NearDuplicateIndex, estimated_similarity, minhash
+
+ORIGINAL = (
+    "A ball is thrown vertically upwards with a speed of 20 m/s from the top of a tower. "
+    "How long does it take to reach the maximum height? A) 1 s B) 2 s C) 3 s D) 4 s"
+)
+REWORDED = (
+    "A ball is thrown vertically upwards with a speed of 20 m/s from the top of the tower. "
+    "How long will it take to reach its maximum height? A) 1 s B) 2 s C) 3 s D) 4 s"
+)
+UNRELATED = (
+    "Which of the following compounds shows geometrical isomerism? "
+    "A) 1-butene B) 2-butene C) propene D) ethene"
+)
+
+
+def test_minhash_is_deterministic():
+    assert minhash(ORIGINAL) == minhash(ORIGINAL)
+    assert estimated_similarity(minhash(ORIGINAL), minhash(ORIGINAL)) == 1.0
+
+
+def test_near_duplicate_is_found():
+    index = NearDuplicateIndex()
+    index.add("original", ORIGINAL)
+
+    duplicate = index.find_duplicate(REWORDED)
+
+    assert duplicate is not None
+    assert duplicate[0] == "original"
+    assert duplicate[1] >= index.threshold
+
+
+def test_unrelated_question_is_not_a_duplicate():
+    index = NearDuplicateIndex()
+    index.add("original", ORIGINAL)
+
+    assert index.find_duplicate(UNRELATED) is None
+
+
+def test_check_and_add_indexes_only_unique_texts():
+    index = NearDuplicateIndex()
+
+    assert index.check_and_add("original", ORIGINAL) is None
+    assert index.check_and_add("reworded", REWORDED)[0] == "original"
+    assert index.check_and_add("unrelated", UNRELATED) is None
+    assert len(index) == 2
+
+
+def test_removed_entries_no_longer_match():
+    index = NearDuplicateIndex()
+    index.add("original", ORIGINAL)
+
+    index.remove("original")
+
+    assert len(index) == 0
+    assert index.find_duplicate(REWORDED) is None
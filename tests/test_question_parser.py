@@ -0,0 +1,77 @@
+import json
+
+from question_parser import IncrementalQuestionParser, salvage_questions
+
+
+def question(n: int) -> dict:
+    return {
+        "question": f"Question {n}: evaluate [a, b] where {{x}} is given",
+        "options": ["1", "2", "3", "4"],
+        "correct_index": n % 4,
+        "solution": "Nested ] and } inside strings must not end the item",
+        "meta": {"tags": [["kinematics"], {"level": n}]}
+    }
+
+
+def payload(count: int) -> str:
+    return json.dumps({"questions": [question(n) for n in range(count)]})
+
+
+def test_complete_payload():
+    questions, complete = salvage_questions(payload(3))
+
+    assert complete
+    assert questions == [question(n) for n in range(3)]
+
+
+def test_truncated_payload_keeps_complete_items():
+    text = payload(3)
+    cut = text.rindex('{"question"') + 25  # Part way through the third question
+
+    questions, complete = salvage_questions(text[:cut])
+
+    assert not complete
+    assert questions == [question(0), question(1)]
+
+
+def test_code_fences_and_surrounding_text_are_skipped():
+    text = "Here are your questions:\n```json\n" + payload(2) + "\n```\nGood luck!"
+
+    questions, complete = salvage_questions(text)
+
+    assert complete
+    assert questions == [question(0), question(1)]
+
+
+def test_bare_array_is_accepted():
+    questions, complete = salvage_questions(json.dumps([question(0)]))
+
+    assert complete
+    assert questions == [question(0)]
+
+
+def test_malformed_item_is_skipped():
+    text = '{"questions": [{"question": "ok", "options": []}, {"question": oops}, {"question": "fine"}]}'
+    parser = IncrementalQuestionParser()
+
+    questions = parser.feed(text, final=True)
+
+    assert [q["question"] for q in questions] == ["ok", "fine"]
+    assert parser.skipped == 1
+    assert parser.complete
+
+
+def test_incremental_feed_yields_items_as_they_close():
+    text = payload(3)
+    parser = IncrementalQuestionParser()
+
+    seen = []
+    for i in range(0, len(text), 7):
+        seen.extend(parser.feed(text[i:i + 7]))
+
+    assert seen == [question(n) for n in range(3)]
+    assert parser.complete
+
+
+def test_empty_response():
+    assert salvage_questions("") == ([], False)
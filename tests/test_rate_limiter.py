@@ -0,0 +1,111 @@
+import asyncio
+
+import pytest
+
+from rate_limiter import AdaptiveRateLimiter, TokenBucket
+
+
+class Throttled(Exception):
+    pass
+
+
+def limiter(**options) -> AdaptiveRateLimiter:
+    return AdaptiveRateLimiter(**{
+        "requests_per_minute": 6000,
+        "tokens_per_minute": 1_000_000,
+        "max_concurrency": 8,
+        "initial_concurrency": 4,
+        "is_throttle_error": lambda exc: isinstance(exc, Throttled),
+        **options
+    })
+
+
+async def call(limiter: AdaptiveRateLimiter, error: Exception = None, tokens_used: int = None):
+    async with await limiter.acquire(100) as permit:
+        permit.record_tokens(tokens_used)
+        if error:
+            raise error
+
+
+def test_successes_increase_concurrency_additively():
+    async def scenario():
+        rate_limiter = limiter()
+        for _ in range(4):
+            await call(rate_limiter)
+        assert 4.9 < rate_limiter.concurrency_limit < 5.1  # About +1 per window of 4 successes
+
+        for _ in range(100):
+            await call(rate_limiter)
+        assert rate_limiter.concurrency_limit == 8  # Capped at max_concurrency
+
+    asyncio.run(scenario())
+
+
+def test_throttling_halves_concurrency_and_drains_requests():
+    async def scenario():
+        rate_limiter = limiter()
+        with pytest.raises(Throttled):
+            await call(rate_limiter, Throttled())
+        assert rate_limiter.concurrency_limit == 2
+        assert rate_limiter.throttled == 1
+        assert rate_limiter.requests.tokens <= 0
+
+        rate_limiter.requests.tokens = rate_limiter.requests.capacity  # Skip the back-off wait
+        with pytest.raises(Throttled):
+            await call(rate_limiter, Throttled())
+        with pytest.raises(Throttled):
+            await call(rate_limiter, Throttled())
+        assert rate_limiter.concurrency_limit == 1  # Never below one
+
+    asyncio.run(scenario())
+
+
+def test_other_errors_leave_concurrency_unchanged():
+    async def scenario():
+        rate_limiter = limiter()
+        with pytest.raises(ValueError):
+            await call(rate_limiter, ValueError())
+        assert rate_limiter.concurrency_limit == 4
+        assert rate_limiter.stats()["in_flight"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_in_flight_calls_are_capped_at_the_concurrency_limit():
+    async def scenario():
+        rate_limiter = limiter(initial_concurrency=2)
+        release = asyncio.Event()
+        peak = 0
+
+        async def slow_call():
+            nonlocal peak
+            async with await rate_limiter.acquire(100):
+                peak = max(peak, rate_limiter.stats()["in_flight"])
+                await release.wait()
+
+        tasks = [asyncio.create_task(slow_call()) for _ in range(5)]
+        await asyncio.sleep(0.01)
+        assert rate_limiter.stats()["in_flight"] == 2
+
+        release.set()
+        await asyncio.gather(*tasks)
+        assert peak == 2
+
+    asyncio.run(scenario())
+
+
+def test_token_estimates_are_reconciled_with_actual_usage():
+    async def scenario():
+        rate_limiter = limiter()
+        before = rate_limiter.output_tokens.tokens
+        await call(rate_limiter, tokens_used=40)
+        assert rate_limiter.output_tokens.tokens == pytest.approx(before - 40, abs=1)
+
+    asyncio.run(scenario())
+
+
+def test_token_bucket_wait_time():
+    bucket = TokenBucket(per_minute=60)
+    bucket.take(60)
+    assert bucket.wait_time(1) == pytest.approx(1.0, abs=0.05)
+    assert bucket.wait_time(1000) == pytest.approx(60.0, abs=0.1)  # Oversized requests wait for a full bucket